@@ -0,0 +1,312 @@
+"""Benchmark van de spraak-naar-herinnering-pijplijn, op de nep-backend van 'Remind Me.py'.
+
+Speelt een corpus van opnames af via de nep-microfoon en meet per uiting elk stadium, langs beide opnamepaden:
+batch:  record_audio -> apply_noise_reduction -> vad_filter -> speech_to_text -> extractie -> voeg_herinnering_toe
+stream: stream_speech (opname en herkenning tegelijk, standaard op het apparaat) -> extractie -> voeg_herinnering_toe
+De extractielatentie wordt ook per route (lokaal, cache, deepseek) gerapporteerd.
+Het resultaat (p50/p95 per stadium, piek-RSS en extractie-nauwkeurigheid) gaat als JSON naar schijf,
+zodat runs met --vergelijk naast elkaar gelegd kunnen worden.
+
+Het corpus is een JSON-lijst, paden relatief aan het corpusbestand:
+    [{"wav": "opnames/melk.wav",
+      "tekst": "remind me to buy milk tomorrow at nine a m",   # transcriptie voor de nep-recognizer
+      "llm": "(buy milk, 2026-10-19, 09:00)",                  # gescript Deepseek-antwoord (optioneel)
+      "verwacht": ["buy milk", "+1", "09:00"]}]                # datum als YYYY-MM-DD of +dagen vanaf vandaag
+
+Met REMIND_ME_VOSK_MODEL gebruikt de benchmark de echte Vosk, met --ollama de echte Deepseek.
+Met --pijplijn N gaat het corpus achter elkaar door de audiopijplijn met N ruisonderdrukkingsprocessen
+(plus REMIND_ME_STT_PROCESSEN Vosk-processen); dan telt de latentie van einde opname tot herkende tekst.
+"""
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STADIA = ["opname", "ruisonderdrukking", "vad", "stt", "opname_stt", "einde_spraak", "extractie", "opslaan",
+          "totaal", "totaal_stream", "pijplijn"]
+ROUTES = ["lokaal", "cache", "deepseek"]
+
+def laad_remind_me(tempo):
+    """Importeert 'Remind Me.py' (spatie in de naam) met de nep-backend."""
+    os.environ.setdefault("REMIND_ME_BACKEND", "nep")
+    os.environ["REMIND_ME_AUDIO_TEMPO"] = str(tempo)
+    pad = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Remind Me.py")
+    spec = importlib.util.spec_from_file_location("remind_me", pad)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["remind_me"] = module  # Pijplijnprocessen vinden de functies onder deze naam terug
+    spec.loader.exec_module(module)
+    return module
+
+def percentiel(waarden, p):
+    """Percentiel met lineaire interpolatie, zonder numpy-afhankelijkheid in de rapportage."""
+    if not waarden:
+        return None
+    gesorteerd = sorted(waarden)
+    k = (len(gesorteerd) - 1) * p / 100
+    onder = int(k)
+    boven = min(onder + 1, len(gesorteerd) - 1)
+    return gesorteerd[onder] + (gesorteerd[boven] - gesorteerd[onder]) * (k - onder)
+
+def samenvatting(tijden):
+    return {
+        "n": len(tijden),
+        "p50_ms": round(percentiel(tijden, 50) * 1000, 2) if tijden else None,
+        "p95_ms": round(percentiel(tijden, 95) * 1000, 2) if tijden else None,
+        "gem_ms": round(sum(tijden) / len(tijden) * 1000, 2) if tijden else None,
+    }
+
+def verwachte_datum(datum, vandaag):
+    if datum.startswith("+"):
+        return (vandaag + timedelta(days=int(datum[1:]))).strftime("%Y-%m-%d")
+    return datum
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def meet_uiting(rm, sessie, item, basis, tijden, opname="batch"):
+    """Haalt één uiting door de pijplijn, via het batch- of het streamingpad.
+
+    Geeft het geëxtraheerde tuple, de gebruikte route en de totale duur terug.
+    """
+    audio = rm.lees_wav(os.path.join(basis, item["wav"]), rm.RATE)
+    if rm.KaldiRecognizer is rm.NepRecognizer:
+        # Eén transcriptie per uiting: kwam er geen audio bij de recognizer, dan schuift de
+        # ongebruikte transcriptie niet door naar de volgende uiting
+        rm.NepRecognizer.transcripties.clear()
+        if item.get("tekst"):
+            rm.NepRecognizer.transcripties.append(item["tekst"])
+    if isinstance(sessie, rm.NepDeepseekSessie):
+        sessie.antwoorden = rm.deque([item.get("llm", "")])
+
+    ring = rm.get_audio_ring()
+    start = ring.positie()
+    rm.NepMicrofoon.speel(audio, naam=item["wav"], samplerate=rm.RATE)
+    begin = time.perf_counter()
+
+    stap = begin
+    def klok(stadium):
+        nonlocal stap
+        nu = time.perf_counter()
+        tijden[stadium].append(nu - stap)
+        stap = nu
+
+    if opname == "stream":
+        tekst = rm.stream_speech(start)
+        klok("opname_stt")
+        # Wat de gebruiker merkt: van het einde van de opname tot de herkende tekst
+        tijden["einde_spraak"].append(stap - begin - len(audio) / rm.RATE / rm.NepMicrofoon.tempo)
+    else:
+        ruw = rm.record_audio(duration=len(audio) / rm.RATE + 0.1, start=start)
+        klok("opname")
+        if ruw is None:
+            return None, "geen audio", None
+        schoon = rm.apply_noise_reduction(ruw)
+        klok("ruisonderdrukking")
+        spraak = rm.vad_filter(schoon)
+        klok("vad")
+        tekst = rm.speech_to_text(spraak)
+        klok("stt")
+    treffers = rm.extractie_cache.treffers
+    resultaat = rm.extraheer_herinnering(sessie, tekst) if tekst else None
+    klok("extractie")
+    if resultaat:
+        rm.voeg_herinnering_toe(*resultaat)
+        klok("opslaan")
+    totaal = time.perf_counter() - begin
+    tijden["totaal_stream" if opname == "stream" else "totaal"].append(totaal)
+
+    # Welke route de extractie nam, buiten de meting om bepaald
+    if not tekst:
+        return resultaat, "geen tekst", totaal
+    lokaal, zekerheid = rm.parse_lokaal(tekst)
+    if lokaal and zekerheid >= rm.LOKAAL_MIN_ZEKERHEID:
+        route = "lokaal"
+    elif rm.extractie_cache.treffers > treffers:
+        route = "cache"
+    else:
+        route = "deepseek"
+    return resultaat, route, totaal
+
+async def meet_pijplijn(rm, corpus, basis, herhalingen, tijden):
+    """Speelt het corpus achter elkaar af met een knopdruk per uiting; de pijplijn verwerkt ze tegelijk.
+
+    Geeft de resultaten, het aantal geweigerde uitingen (back-pressure) en de totale duur terug.
+    """
+    rm.pijplijn = await rm.AudioPijplijn(rm.audio_ring).start()
+    resultaten = []
+    geweigerd = 0
+    taken = []
+    # Genoeg stilte tussen twee uitingen, anders hoort de vorige uiting de volgende er nog bij
+    pauze = (rm.STILTE_EINDE + 0.5) / rm.NepMicrofoon.tempo
+
+    async def uiting(item, start, opname_einde):
+        herkenning = await rm.pijplijn.herken(start)
+        tijden["pijplijn"].append(time.perf_counter() - opname_einde)
+        resultaten.append({"wav": item["wav"], "tekst": herkenning["text"] if herkenning else None,
+                           "verwacht": item.get("tekst")})
+
+    begin = time.perf_counter()
+    for ronde in range(herhalingen):
+        for item in corpus:
+            audio = rm.lees_wav(os.path.join(basis, item["wav"]), rm.RATE)
+            duur = len(audio) / rm.RATE / rm.NepMicrofoon.tempo
+            start = rm.audio_ring.positie()
+            rm.NepMicrofoon.speel(audio, naam=item["wav"], samplerate=rm.RATE)
+            if rm.pijplijn.vol():
+                geweigerd += 1
+            else:
+                taken.append(rm.pijplijn.start_uiting(uiting(item, start, time.perf_counter() + duur)))
+            await asyncio.sleep(duur + pauze)
+    await asyncio.gather(*taken)
+    return resultaten, geweigerd, time.perf_counter() - begin
+
+def vergelijk(oud_pad, nieuw):
+    with open(oud_pad, encoding="utf-8") as f:
+        oud = json.load(f)
+    print(f"\n📊 Vergelijking met {oud_pad} (commit {oud.get('commit')}):")
+    for stadium in STADIA:
+        a, b = oud["stadia"].get(stadium, {}), nieuw["stadia"][stadium]
+        for maat in ("p50_ms", "p95_ms"):
+            if a.get(maat) and b.get(maat) is not None:
+                verschil = (b[maat] - a[maat]) / a[maat] * 100
+                print(f"  {stadium:18} {maat}: {a[maat]:9.2f} -> {b[maat]:9.2f} ms ({verschil:+.1f}%)")
+    print(f"  piek-RSS: {oud['piek_rss_mb']} -> {nieuw['piek_rss_mb']} MB")
+    print(f"  nauwkeurigheid: {oud['nauwkeurigheid']['tuple']} -> {nieuw['nauwkeurigheid']['tuple']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="JSON-corpus met opnames en verwachte tuples")
+    parser.add_argument("--herhalingen", type=int, default=1, help="Aantal keer dat het corpus afgespeeld wordt")
+    parser.add_argument("--tempo", type=float, default=1.0, help="Afspeelsnelheid van de nep-microfoon t.o.v. real time")
+    parser.add_argument("--ollama", action="store_true", help="Gebruik de echte Deepseek via Ollama")
+    parser.add_argument("--opname", choices=["batch", "stream", "beide"], default="beide",
+                        help="Opnamepad: record_audio + speech_to_text, stream_speech (standaard op het apparaat) of beide")
+    parser.add_argument("--uitvoer", help="Pad voor het JSON-resultaat (standaard benchmarks/<tijdstip>.json)")
+    parser.add_argument("--vergelijk", help="Eerder JSON-resultaat om tegen te vergelijken")
+    parser.add_argument("--pijplijn", type=int, default=0, metavar="N",
+                        help="Meet de audiopijplijn met N ruisonderdrukkingsprocessen (vereist een echt Vosk-model)")
+    args = parser.parse_args()
+    if args.pijplijn:
+        os.environ["REMIND_ME_AUDIO_PROCESSEN"] = str(args.pijplijn)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+    basis = os.path.dirname(os.path.abspath(args.corpus))
+
+    rm = laad_remind_me(args.tempo)
+    if args.pijplijn and rm.KaldiRecognizer is rm.NepRecognizer:
+        sys.exit("❌ --pijplijn heeft een echt Vosk-model nodig (REMIND_ME_VOSK_MODEL): de nep-recognizer "
+                 "krijgt zijn transcripties niet in de andere processen.")
+    rm.RUISPROFIEL_PATH = os.path.join(tempfile.mkdtemp(prefix="remind-me-bench-"), "ruisprofiel.npz")
+    if args.ollama:
+        sessie = rm.DeepseekSessie()
+        if not sessie.start() or not sessie.warm_op():
+            sys.exit("❌ Deepseek is niet bereikbaar.")
+    else:
+        sessie = rm.NepDeepseekSessie()
+
+    rm.open_opslag()
+    rm.get_audio_ring()
+    rm.kalibreer_ruis()  # Ruisprofiel van de nep-microfoon, net als bij de eerste start op de Pi
+
+    vandaag = datetime.now()
+    tijden = {stadium: [] for stadium in STADIA}
+    per_route = {route: [] for route in ROUTES}  # Extractielatentie per route
+    resultaten = []
+    goed = {"tuple": 0, "beschrijving": 0, "datum": 0, "tijd": 0}
+    pijplijn = None
+    if args.pijplijn:
+        uitingen, geweigerd, duur = asyncio.run(meet_pijplijn(rm, corpus, basis, args.herhalingen, tijden))
+        beoordeeld_tekst = [u for u in uitingen if u["verwacht"]]
+        pijplijn = {
+            "ruis_processen": rm.AUDIO_PROCESSEN,
+            "stt_processen": rm.STT_PROCESSEN,
+            "doorvoer_per_s": round(len(uitingen) / duur, 3),
+            "geweigerd": geweigerd,
+            "tekst_exact": round(sum(u["tekst"] == u["verwacht"] for u in beoordeeld_tekst) / len(beoordeeld_tekst), 3)
+            if beoordeeld_tekst else None,
+        }
+        resultaten = uitingen
+    paden = [] if args.pijplijn else ["batch", "stream"] if args.opname == "beide" else [args.opname]
+    for opname, _, item in itertools.product(paden, range(args.herhalingen), corpus):
+        resultaat, route, totaal = meet_uiting(rm, sessie, item, basis, tijden, opname)
+        if route in per_route:
+            per_route[route].append(tijden["extractie"][-1])
+        verwacht = item.get("verwacht")
+        if verwacht:
+            verwacht = [verwacht[0].lower(), verwachte_datum(verwacht[1], vandaag), verwacht[2]]
+            gevonden = [resultaat[0].lower(), resultaat[1], resultaat[2]] if resultaat else [None] * 3
+            for veld, a, b in zip(("beschrijving", "datum", "tijd"), gevonden, verwacht):
+                goed[veld] += a == b
+            goed["tuple"] += gevonden == verwacht
+        resultaten.append({"wav": item["wav"], "opname": opname, "route": route, "resultaat": resultaat,
+                           "verwacht": verwacht})
+        print(f"⏱ {item['wav']} ({opname}): {totaal * 1000 if resultaat else float('nan'):.0f} ms via {route}")
+
+    if args.ollama:
+        sessie.stop()
+    if rm.pijplijn is not None:
+        rm.pijplijn.stop()
+    rm.audio_ring.stop()
+    rm.opslag.sluit()
+
+    beoordeeld = 0 if args.pijplijn else sum(1 for r in resultaten if r["verwacht"])
+    rapport = {
+        "tijdstip": vandaag.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "backend": rm.BACKEND,
+        "recognizer": "nep" if rm.KaldiRecognizer is rm.NepRecognizer else "vosk",
+        "llm": "ollama" if args.ollama else "nep",
+        "python": platform.python_version(),
+        "corpus": args.corpus,
+        "uitingen": len(resultaten),
+        "stadia": {stadium: samenvatting(tijden[stadium]) for stadium in STADIA},
+        # ru_maxrss is in KiB op Linux
+        "piek_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "nauwkeurigheid": {veld: round(aantal / beoordeeld, 3) if beoordeeld else None for veld, aantal in goed.items()},
+        "lokaal_aandeel": round(sum(r.get("route") == "lokaal" for r in resultaten) / max(len(resultaten), 1), 3),
+        "routes": {route: {"aandeel": round(len(per_route[route]) / max(len(resultaten), 1), 3),
+                           **samenvatting(per_route[route])} for route in ROUTES},
+        "pijplijn": pijplijn,
+        # Grootste pijplijnproces, gemeten nadat ze gestopt zijn
+        "piek_rss_processen_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "resultaten": resultaten,
+    }
+
+    uitvoer = args.uitvoer or os.path.join("benchmarks", f"{vandaag:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(uitvoer) or ".", exist_ok=True)
+    with open(uitvoer, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2)
+
+    print("\n📊 Resultaat per stadium:")
+    for stadium, s in rapport["stadia"].items():
+        if s["n"]:
+            print(f"  {stadium:18} p50 {s['p50_ms']:9.2f} ms   p95 {s['p95_ms']:9.2f} ms   (n={s['n']})")
+    for route, s in rapport["routes"].items():
+        if s["n"]:
+            print(f"  extractie {route:8} p50 {s['p50_ms']:9.2f} ms   p95 {s['p95_ms']:9.2f} ms   (n={s['n']})")
+    print(f"  piek-RSS: {rapport['piek_rss_mb']} MB, nauwkeurigheid: {rapport['nauwkeurigheid']}")
+    if pijplijn:
+        print(f"  pijplijn: {pijplijn}")
+    print(f"💾 Opgeslagen in {uitvoer}")
+    if args.vergelijk:
+        vergelijk(args.vergelijk, rapport)
+
+if __name__ == '__main__':
+    main()
+elif __name__ == '__mp_main__':
+    # Pijplijnprocessen (spawn) draaien dit script opnieuw en hebben 'remind_me' dan ook nodig
+    laad_remind_me(float(os.environ.get("REMIND_ME_AUDIO_TEMPO", "1.0")))
\ No newline at end of file
@@ -14,10 +14,36 @@ BLEService uartService = BLEService(UART_SERVICE_UUID);
 BLECharacteristic uartRxCharacteristic = BLECharacteristic(UART_RX_CHARACTERISTIC_UUID);
 BLECharacteristic uartTxCharacteristic = BLECharacteristic(UART_TX_CHARACTERISTIC_UUID);
 
-// Variabelen voor het knipperen
-bool isBlinking = false;  // Geeft aan of de LED en buzzer moeten knipperen
-unsigned long previousMillis = 0;  // Tijdstip van de laatste toestandswisseling
-const long blinkInterval = 500;  // Interval voor knipperen (500 ms)
+// Binair commandoprotocol (versie 1), zie maak_ble_commando() in 'Remind Me.py':
+// [versie, seq, patroon, aan_ms (u16 LE), uit_ms (u16 LE), herhalingen, timeout_s (u16 LE), checksum]
+#define PROTOCOL_VERSIE 1
+#define FRAME_LENGTE 11
+#define PATROON_UIT 0
+#define PATROON_KNIPPER 1
+#define PATROON_AAN 2
+#define BERICHT_ACK 0xA0  // Antwoord op elk commando
+#define BERICHT_STATUS 0xA1  // Patroon is vanzelf gestopt (herhalingen op of timeout)
+#define STATUS_OK 0
+#define STATUS_CHECKSUM 1
+#define STATUS_VERSIE 2
+#define STATUS_PATROON 3
+
+// Het actieve patroon; twee FreeRTOS-softwaretimers voeren het zelfstandig uit
+struct Patroon {
+    uint8_t id;
+    uint8_t seq;  // Commando dat dit patroon startte
+    uint16_t aanMs;
+    uint16_t uitMs;
+    uint8_t herhalingen;  // 0 = onbeperkt
+    uint16_t timeoutS;  // 0 = geen timeout
+};
+
+Patroon patroon = {PATROON_UIT, 0, 0, 0, 0, 0};
+bool uitgangAan = false;  // Huidige toestand van LED en buzzer
+uint8_t cycli = 0;  // Aantal voltooide aan/uit-cycli
+SoftwareTimer faseTimer;  // Eenmalig: einde van de huidige aan- of uit-fase
+SoftwareTimer timeoutTimer;  // Eenmalig: automatische stop na patroon.timeoutS
+uint16_t laatsteVerbinding = BLE_CONN_HANDLE_INVALID;  // Verbinding voor statusmeldingen
 
 void setup() {
     Serial.begin(115200);
@@ -34,7 +60,13 @@ void setup() {
     // Initialiseer Bluetooth
     Bluefruit.begin();
     Bluefruit.setName("XIAO_Central");
-    Bluefruit.setTxPower(4);
+    Bluefruit.setTxPower(0);  // De Pi staat in dezelfde kamer; 0 dBm scheelt stroom bij elk pakket
+    Bluefruit.Periph.setConnInterval(24, 24);  // Voorkeur 30 ms; de slave latency in bijVerbinden doet de rest
+    Bluefruit.Periph.setConnectCallback(bijVerbinden);
+
+    // Timers voor het alarmpatroon; ze starten pas bij een commando
+    faseTimer.begin(1000, faseVoorbij, NULL, false);
+    timeoutTimer.begin(1000, timeoutVoorbij, NULL, false);
 
     // Configureer de UART-service
     setupUART();
@@ -43,6 +75,28 @@ void setup() {
     startAdv();
 
     Serial.println("Bluetooth klaar!");
+
+    // Alles gebeurt in callbacks; zonder loop-taak slaapt de CPU tussen events (tickless idle)
+    suspendLoop();
+}
+
+// De link blijft altijd open, dus de XIAO wordt elke connection event wakker zolang hij niets overslaat.
+// Interval 30 ms met slave latency 19: de XIAO luistert maar eens per (19 + 1) x 30 ms = 600 ms.
+// Schatting voor de nRF52840 bij 0 dBm, ~10 uC per lege connection event:
+//   7,5 ms, latency 4  -> elke 37,5 ms -> ~270 uA gemiddeld (de vorige instelling)
+//   30 ms, latency 19  -> elke 600 ms  -> ~17 uA gemiddeld
+//   traag adverteren (1 s, zonder verbinding, zoals vroeger) -> ~15 uA
+// Prijs: een commando wacht tot de volgende keer dat de XIAO luistert, gemiddeld ~300 ms en
+// hooguit ~600 ms; de ack gaat een interval (30 ms) later terug, want met data in de wachtrij
+// slaat de XIAO geen events over. BLE_ACK_TIMEOUT in 'Remind Me.py' is daarop afgestemd.
+#define CONN_INTERVAL 24  // In eenheden van 1,25 ms: 30 ms
+#define CONN_LATENCY 19  // Lege connection events die de XIAO mag overslaan
+#define CONN_TIMEOUT 400  // Supervision timeout in eenheden van 10 ms: 4 s, ruim boven 2 x 600 ms
+
+void bijVerbinden(uint16_t conn_handle) {
+    laatsteVerbinding = conn_handle;
+    BLEConnection* verbinding = Bluefruit.Connection(conn_handle);
+    verbinding->requestConnectionParameter(CONN_INTERVAL, CONN_LATENCY, CONN_TIMEOUT);
 }
 
 void setupUART() {
@@ -50,7 +104,7 @@ void setupUART() {
     uartService.begin();
 
     // Configureer de RX-karakteristiek
-    uartRxCharacteristic.setProperties(CHR_PROPS_WRITE);
+    uartRxCharacteristic.setProperties(CHR_PROPS_WRITE | CHR_PROPS_WRITE_WO_RESP);
     uartRxCharacteristic.setPermission(SECMODE_OPEN, SECMODE_OPEN);
     uartRxCharacteristic.setFixedLen(20);
     uartRxCharacteristic.begin();
@@ -66,23 +120,123 @@ void setupUART() {
     Bluefruit.Advertising.addService(uartService);
 }
 
+void zetUitgang(bool aan) {
+    uitgangAan = aan;
+    digitalWrite(LED_PIN, aan ? HIGH : LOW);
+    digitalWrite(BUZZER_PIN1, aan ? HIGH : LOW);
+    digitalWrite(BUZZER_PIN2, aan ? HIGH : LOW);
+}
+
+void stuurMelding(uint16_t conn_handle, uint8_t soort, uint8_t seq, uint8_t status) {
+    // Meldingen gebruiken dezelfde vaste lengte als de TX-karakteristiek
+    uint8_t buf[20] = {0};
+    buf[0] = PROTOCOL_VERSIE;
+    buf[1] = soort;
+    buf[2] = seq;
+    buf[3] = status;
+    buf[4] = patroon.id;
+    if (conn_handle != BLE_CONN_HANDLE_INVALID && Bluefruit.connected(conn_handle)) {
+        uartTxCharacteristic.notify(conn_handle, buf, sizeof(buf));
+    }
+}
+
+void stopPatroon() {
+    faseTimer.stop();
+    timeoutTimer.stop();
+    patroon.id = PATROON_UIT;
+    zetUitgang(false);
+}
+
+void startPatroon(const Patroon& nieuw) {
+    stopPatroon();
+    patroon = nieuw;
+    cycli = 0;
+    if (patroon.id == PATROON_UIT) {
+        return;
+    }
+    // Een knipperpatroon begint met de aan-fase, zodat het alarm direct zichtbaar is
+    zetUitgang(true);
+    if (patroon.id == PATROON_KNIPPER) {
+        faseTimer.setPeriod(patroon.aanMs);  // Herstart de timer met de nieuwe periode
+    }
+    if (patroon.timeoutS > 0) {
+        timeoutTimer.setPeriod(patroon.timeoutS * 1000UL);
+    }
+}
+
+void faseVoorbij(TimerHandle_t timer) {
+    if (patroon.id != PATROON_KNIPPER) {
+        return;
+    }
+    if (!uitgangAan) {
+        cycli++;
+        if (patroon.herhalingen > 0 && cycli >= patroon.herhalingen) {
+            stopPatroon();
+            stuurMelding(laatsteVerbinding, BERICHT_STATUS, patroon.seq, STATUS_OK);
+            Serial.println("Patroon klaar");
+            return;
+        }
+    }
+    zetUitgang(!uitgangAan);
+    faseTimer.setPeriod(uitgangAan ? patroon.aanMs : patroon.uitMs);
+}
+
+void timeoutVoorbij(TimerHandle_t timer) {
+    if (patroon.id == PATROON_UIT) {
+        return;
+    }
+    stopPatroon();
+    stuurMelding(laatsteVerbinding, BERICHT_STATUS, patroon.seq, STATUS_OK);
+    Serial.println("Patroon gestopt na timeout");
+}
+
+uint16_t leesU16(const uint8_t* data) {
+    return data[0] | (data[1] << 8);
+}
+
 void uartRxCallback(uint16_t conn_handle, BLECharacteristic* chr, uint8_t* data, uint16_t len) {
     // Verwerk ontvangen data
-    if (len > 0) {
-        char received = data[0];  // Lees het eerste karakter
-        if (received == '2') {
-            // Start het knipperen
-            isBlinking = true;
-            Serial.println("LED en Buzzer KNIPPEREN");
-        } else if (received == '0') {
-            // Stop het knipperen en zet de LED en buzzer uit
-            isBlinking = false;
-            digitalWrite(LED_PIN, LOW);
-            digitalWrite(BUZZER_PIN1, LOW);
-            digitalWrite(BUZZER_PIN2, LOW);
-            Serial.println("LED en Buzzer UIT");
-        }
+    if (len == 0) {
+        return;
     }
+    laatsteVerbinding = conn_handle;
+
+    // Oude één-teken-commando's blijven werken
+    if (data[0] == '2') {
+        startPatroon({PATROON_KNIPPER, 0, 500, 500, 0, 0});
+        Serial.println("LED en Buzzer KNIPPEREN");
+        return;
+    } else if (data[0] == '0') {
+        startPatroon({PATROON_UIT, 0, 0, 0, 0, 0});
+        Serial.println("LED en Buzzer UIT");
+        return;
+    }
+
+    if (len < FRAME_LENGTE || data[0] != PROTOCOL_VERSIE) {
+        stuurMelding(conn_handle, BERICHT_ACK, len > 1 ? data[1] : 0, STATUS_VERSIE);
+        return;
+    }
+    uint8_t seq = data[1];
+    uint8_t checksum = 0;
+    for (int i = 0; i < FRAME_LENGTE - 1; i++) {
+        checksum ^= data[i];
+    }
+    if (checksum != data[FRAME_LENGTE - 1]) {
+        stuurMelding(conn_handle, BERICHT_ACK, seq, STATUS_CHECKSUM);
+        return;
+    }
+    Patroon nieuw = {data[2], seq, leesU16(data + 3), leesU16(data + 5), data[7], leesU16(data + 8)};
+    if (nieuw.id > PATROON_AAN || (nieuw.id == PATROON_KNIPPER && (nieuw.aanMs == 0 || nieuw.uitMs == 0))) {
+        stuurMelding(conn_handle, BERICHT_ACK, seq, STATUS_PATROON);
+        return;
+    }
+
+    startPatroon(nieuw);
+    stuurMelding(conn_handle, BERICHT_ACK, seq, STATUS_OK);
+    Serial.print("Patroon ");
+    Serial.print(nieuw.id);
+    Serial.print(" gestart door commando ");
+    Serial.println(seq);
 }
 
 void startAdv() {
@@ -90,19 +244,13 @@ void startAdv() {
     Bluefruit.Advertising.addFlags(BLE_GAP_ADV_FLAGS_LE_ONLY_GENERAL_DISC_MODE);
     Bluefruit.Advertising.addTxPower();
     Bluefruit.Advertising.addService(uartService);
+    Bluefruit.Advertising.restartOnDisconnect(true);
+    // Eerst 30 s snel (20 ms) zodat de Pi direct herverbindt, daarna traag (1 s) om te sparen
+    Bluefruit.Advertising.setInterval(32, 1600);  // In eenheden van 0,625 ms
+    Bluefruit.Advertising.setFastTimeout(30);
     Bluefruit.Advertising.start(0);  // Adverteren zonder tijdslimiet
 }
 
 void loop() {
-    // Beheer het knipperen van de LED en buzzer
-    if (isBlinking) {
-        unsigned long currentMillis = millis();
-        if (currentMillis - previousMillis >= blinkInterval) {
-            // Wissel de toestand van de LED en buzzer
-            digitalWrite(LED_PIN, !digitalRead(LED_PIN));
-            digitalWrite(BUZZER_PIN1, !digitalRead(BUZZER_PIN1));
-            digitalWrite(BUZZER_PIN2, !digitalRead(BUZZER_PIN2));
-            previousMillis = currentMillis;
-        }
-    }
+    // Niet gebruikt: de loop-taak is in setup() stilgezet, de timers sturen het patroon
 }
\ No newline at end of file
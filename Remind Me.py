@@ -1,50 +1,719 @@
-import sounddevice as sd
 import numpy as np
 import noisereduce as nr
 import webrtcvad
 import json
+import os
 import sqlite3
 import subprocess
 import time
 import re
-from vosk import Model, KaldiRecognizer
-import RPi.GPIO as GPIO
-from time import sleep
-import smbus2 as smbus
+import struct
+import heapq
+import wave
+import urllib.request
+import urllib.error
 import threading
-from datetime import datetime
+import multiprocessing
+from multiprocessing import shared_memory
+import unicodedata
+from collections import deque
+from types import SimpleNamespace
+from datetime import datetime, timedelta
 import asyncio
-from bleak import BleakClient
+import signal
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Hardware-backend: 'pi' voor de echte hardware, 'nep' voor in-memory vervangers die alles met
+# tijdstempels vastleggen, zodat de hele pijplijn op een gewone Linux-machine gemeten kan worden
+BACKEND = os.environ.get("REMIND_ME_BACKEND", "pi")
+
+class NepGPIO:
+    """Vervangt RPi.GPIO: houdt de pinniveaus bij en legt elke overgang met tijdstip vast."""
+
+    BCM = "BCM"
+    OUT = "out"
+    IN = "in"
+    PUD_UP = "pud_up"
+    LOW = 0
+    HIGH = 1
+    RISING = "rising"
+    FALLING = "falling"
+    BOTH = "both"
+
+    def __init__(self):
+        self.niveaus = {}
+        self.callbacks = {}
+        self.overgangen = []  # (perf_counter, pin, niveau)
+
+    def setwarnings(self, aan):
+        pass
+
+    def setmode(self, modus):
+        pass
+
+    def setup(self, pin, richting, pull_up_down=None, initial=LOW):
+        self.niveaus[pin] = self.HIGH if pull_up_down == self.PUD_UP else initial
+
+    def output(self, pin, niveau):
+        niveau = self.HIGH if niveau else self.LOW
+        if self.niveaus.get(pin) != niveau:
+            self.overgangen.append((time.perf_counter(), pin, niveau))
+        self.niveaus[pin] = niveau
+
+    def input(self, pin):
+        return self.niveaus.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, flank, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self.niveaus.clear()
+        self.callbacks.clear()
+
+    def druk(self, pin, ingedrukt=True):
+        """Simuleert een flank op een ingang met pull-up (ingedrukt = laag) en roept de interrupt aan."""
+        niveau = self.LOW if ingedrukt else self.HIGH
+        self.overgangen.append((time.perf_counter(), pin, niveau))
+        self.niveaus[pin] = niveau
+        callback = self.callbacks.get(pin)
+        if callback is not None:
+            callback(pin)
+
+class NepI2CBus:
+    """Vervangt smbus2.SMBus: telt de bytes per transactie en rekent de bustijd uit zonder te wachten."""
+
+    BYTE_TIJD = 9 / 100_000  # Seconden per byte op 100 kHz (8 bits + ack)
+
+    def __init__(self, nummer=1):
+        self.nummer = nummer
+        self.bytes_geschreven = 0
+        self.bustijd = 0.0
+        self.transacties = []  # (perf_counter, adres, aantal bytes)
+
+    def _schrijf(self, adres, aantal):
+        self.bytes_geschreven += aantal
+        self.bustijd += (aantal + 1) * self.BYTE_TIJD  # +1 voor het adresbyte
+        self.transacties.append((time.perf_counter(), adres, aantal))
+
+    def write_byte(self, adres, waarde):
+        self._schrijf(adres, 1)
+
+    def write_i2c_block_data(self, adres, register, data):
+        self._schrijf(adres, 1 + len(data))
+
+    def close(self):
+        pass
+
+def lees_wav(pad, samplerate=16000):
+    """Leest een WAV-bestand als mono int16 op `samplerate` (eerste kanaal, lineair herbemonsterd)."""
+    with wave.open(pad, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{pad}: alleen 16-bit WAV wordt ondersteund")
+        kanalen = wav.getnchannels()
+        bron_rate = wav.getframerate()
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")[::kanalen]
+    if bron_rate != samplerate:
+        tijden = np.arange(int(len(audio) * samplerate / bron_rate)) * (bron_rate / samplerate)
+        audio = np.interp(tijden, np.arange(len(audio)), audio).astype(np.int16)
+    return audio.astype(np.int16)
+
+class NepMicrofoon:
+    """Vervangt sd.InputStream: speelt WAV-opnames uit een wachtrij af als microfoon.
+
+    Tussen de opnames levert hij zachte, reproduceerbare ruis. Het tempo (REMIND_ME_AUDIO_TEMPO)
+    is een veelvoud van real time; afgespeeld legt per opname vast wanneer hij begon.
+    """
+
+    wachtrij = deque()
+    afgespeeld = []  # (perf_counter, sampleteller, naam)
+    tempo = float(os.environ.get("REMIND_ME_AUDIO_TEMPO", "1.0"))
+    RUIS_NIVEAU = 30
+
+    def __init__(self, samplerate, blocksize, channels, dtype, device, callback):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.geleverd = 0
+        self.ruis = np.random.default_rng(0)
+        self.huidig = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def speel(cls, bron, naam=None, samplerate=16000):
+        """Zet een WAV-pad of int16-array in de wachtrij; wordt afgespeeld zodra de vorige klaar is."""
+        audio = lees_wav(bron, samplerate) if isinstance(bron, str) else np.asarray(bron, dtype=np.int16)
+        cls.wachtrij.append((naam or (bron if isinstance(bron, str) else "audio"), audio))
+
+    def _blok(self):
+        blok = self.ruis.normal(0, self.RUIS_NIVEAU, self.blocksize).astype(np.int16)
+        gevuld = 0
+        while gevuld < self.blocksize:
+            if self.huidig is None:
+                if not self.wachtrij:
+                    break
+                naam, audio = self.wachtrij.popleft()
+                self.afgespeeld.append((time.perf_counter(), self.geleverd + gevuld, naam))
+                self.huidig = (audio, 0)
+            audio, pos = self.huidig
+            deel = min(self.blocksize - gevuld, len(audio) - pos)
+            blok[gevuld:gevuld + deel] = audio[pos:pos + deel]
+            gevuld += deel
+            self.huidig = (audio, pos + deel) if pos + deel < len(audio) else None
+        return blok
+
+    def _lus(self):
+        blok_tijd = self.blocksize / self.samplerate / self.tempo
+        volgende = time.perf_counter()
+        while not self.stop_event.is_set():
+            blok = self._blok()
+            self.callback(blok.reshape(-1, 1), self.blocksize, None, None)
+            self.geleverd += self.blocksize
+            volgende += blok_tijd
+            self.stop_event.wait(max(volgende - time.perf_counter(), 0))
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._lus, name="nep-microfoon", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def close(self):
+        self.thread = None
+
+class NepRecognizer:
+    """Vervangt vosk.KaldiRecognizer: geeft de transcripties uit een wachtrij terug, één per uiting."""
+
+    transcripties = deque()
+
+    def __init__(self, model, samplerate, grammatica=None):
+        self.samplerate = samplerate
+        self.grammatica = grammatica
+        self.ontvangen = 0  # Bytes audio sinds de laatste Reset
+
+    def SetWords(self, aan):
+        pass
+
+    def SetGrammar(self, grammatica):
+        self.grammatica = grammatica
+
+    def AcceptWaveform(self, data):
+        self.ontvangen += len(data)
+        return False
+
+    def _resultaat(self):
+        tekst = self.transcripties.popleft() if self.transcripties and self.ontvangen else ""
+        self.ontvangen = 0
+        return json.dumps({"text": tekst})
+
+    def Result(self):
+        return self._resultaat()
+
+    def FinalResult(self):
+        return self._resultaat()
+
+    def Reset(self):
+        self.ontvangen = 0
+
+class NepDeepseekSessie:
+    """Vervangt DeepseekSessie: geeft gescripte antwoorden token voor token, met een vaste tokentijd.
+
+    `antwoorden` is een lijst die op volgorde gebruikt wordt, of een functie prompt -> antwoord.
+    """
+
+    def __init__(self, antwoorden=None, token_tijd=0.0):
+        self.antwoorden = deque(antwoorden or []) if not callable(antwoorden) else antwoorden
+        self.token_tijd = token_tijd
+        self.laatste_tokens = 0
+        self.verzoeken = []  # (perf_counter, prompt, seconden)
 
-# Schakel GPIO-waarschuwingen uit
-GPIO.setwarnings(False)
-GPIO.cleanup()
+    def start(self):
+        return True
+
+    def warm_op(self):
+        return True
+
+    def zorg_gestart(self):
+        return True
+
+    def genereer(self, prompt, stream_filter=None):
+        begin = time.perf_counter()
+        if callable(self.antwoorden):
+            antwoord = self.antwoorden(prompt)
+        else:
+            antwoord = self.antwoorden.popleft() if self.antwoorden else ""
+        tekst = []
+        for token in re.findall(r"\S+\s*|\s+", antwoord or ""):
+            if self.token_tijd:
+                time.sleep(self.token_tijd)
+            tekst.append(token)
+            if stream_filter is not None and stream_filter.voeg_toe(token):
+                break
+        self.verzoeken.append((begin, prompt, time.perf_counter() - begin))
+        return "".join(tekst)
+
+    def stop(self):
+        pass
+
+class NepBleakClient:
+    """Vervangt bleak.BleakClient voor een XIAO met de firmware uit 'Remind Me External.py'.
+
+    Writes worden na `latentie` seconden bevestigd met een ack-notificatie, zoals de echte firmware.
+    """
+
+    latentie = 0.005
+    clients = {}  # adres -> laatst aangemaakte client, om na afloop de writes te kunnen bekijken
+    oude_firmware = False  # True: gedraagt zich als de oorspronkelijke firmware, zonder acks
+
+    def __init__(self, adres, disconnected_callback=None):
+        self.adres = adres
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.notificatie = None
+        self.writes = []  # (perf_counter, bytes)
+        self.clients[adres] = self
+
+    async def connect(self):
+        await asyncio.sleep(self.latentie)
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def start_notify(self, uuid, callback):
+        self.notificatie = callback
+
+    async def write_gatt_char(self, uuid, data, response=False):
+        if not self.is_connected:
+            raise ConnectionError(f"{self.adres} is niet verbonden")
+        self.writes.append((time.perf_counter(), bytes(data)))
+        if response:
+            await asyncio.sleep(self.latentie)
+        if self.notificatie is None or self.oude_firmware or data[:1] in (b"2", b"0"):
+            return
+        ack = bytearray(20)
+        if len(data) >= 3 and data[0] == BLE_PROTOCOL_VERSIE:
+            ack[:5] = bytes([BLE_PROTOCOL_VERSIE, BERICHT_ACK, data[1], BLE_STATUS_OK, data[2]])
+        else:
+            ack[:4] = bytes([BLE_PROTOCOL_VERSIE, BERICHT_ACK, data[1] if len(data) > 1 else 0, BLE_STATUS_VERSIE])
+        asyncio.get_running_loop().call_later(self.latentie, self.notificatie, uuid, ack)
+
+    def verbreek(self):
+        """Simuleert een weggevallen link."""
+        self.is_connected = False
+        if self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+
+class NepModel:
+    def __init__(self, pad):
+        self.pad = pad
+
+if BACKEND == "nep":
+    sd = SimpleNamespace(InputStream=NepMicrofoon)
+    smbus = SimpleNamespace(SMBus=NepI2CBus)
+    GPIO = NepGPIO()
+    BleakClient = NepBleakClient
+    if os.environ.get("REMIND_ME_VOSK_MODEL"):
+        from vosk import Model, KaldiRecognizer
+    else:
+        Model, KaldiRecognizer = NepModel, NepRecognizer
+else:
+    import sounddevice as sd
+    from vosk import Model, KaldiRecognizer
+    import RPi.GPIO as GPIO
+    import smbus2 as smbus
+    from bleak import BleakClient
+
+# Instrumentatie: spans, tellers en rollende histogrammen. Staat uit tenzij REMIND_ME_METRICS gezet is;
+# uitgeschakeld kost een span of teller alleen één attribuutcontrole.
+METRICS_AAN = bool(os.environ.get("REMIND_ME_METRICS"))
+METRICS_LOG = os.environ.get("REMIND_ME_METRICS_LOG", "metrics.jsonl")
+METRICS_ADRES = os.environ.get("REMIND_ME_METRICS_ADRES", "127.0.0.1")
+METRICS_POORT = int(os.environ.get("REMIND_ME_METRICS_POORT", "9108"))
+HISTOGRAM_VENSTER = 256  # Laatste zoveel metingen per span voor de percentielen
+
+class _GeenSpan:
+    """Gedeelde no-op span voor als de instrumentatie uit staat."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_GEEN_SPAN = _GeenSpan()
+
+class _Span:
+    __slots__ = ("metrics", "naam", "labels", "begin")
+
+    def __init__(self, metrics, naam, labels):
+        self.metrics = metrics
+        self.naam = naam
+        self.labels = labels
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, soort, fout, tb):
+        self.metrics.meet(self.naam, time.perf_counter() - self.begin, fout=soort is not None, **self.labels)
+        return False
+
+class Metrics:
+    """Verzamelt spans en tellers in het geheugen, schrijft spans als JSON-regels weg en levert
+    een Prometheus-tekstexport (rollende percentielen per span, plus cumulatieve aantallen en sommen)."""
+
+    def __init__(self, aan=METRICS_AAN, log_pad=METRICS_LOG):
+        self.aan = aan
+        self.log_pad = log_pad
+        self.lock = threading.Lock()
+        self.tellers = {}
+        self.histogrammen = {}  # naam -> deque met de laatste HISTOGRAM_VENSTER duren
+        self.aantallen = {}  # naam -> (aantal, som) sinds de start
+        self.log = None
+        self.server = None
+
+    def span(self, naam, **labels):
+        """Contextmanager die de duur van het blok meet onder `naam`."""
+        if not self.aan:
+            return _GEEN_SPAN
+        return _Span(self, naam, labels)
+
+    def tel(self, naam, n=1):
+        if not self.aan:
+            return
+        with self.lock:
+            self.tellers[naam] = self.tellers.get(naam, 0) + n
+
+    def meet(self, naam, seconden, **labels):
+        """Legt een duur vast, ook voor metingen die niet als blok te omsluiten zijn."""
+        if not self.aan:
+            return
+        with self.lock:
+            self.histogrammen.setdefault(naam, deque(maxlen=HISTOGRAM_VENSTER)).append(seconden)
+            aantal, som = self.aantallen.get(naam, (0, 0.0))
+            self.aantallen[naam] = (aantal + 1, som + seconden)
+            if self.log is None:
+                self.log = open(self.log_pad, "a", buffering=1, encoding="utf-8")
+            self.log.write(json.dumps({"t": round(time.time(), 3), "span": naam,
+                                       "ms": round(seconden * 1000, 3), **labels}) + "\n")
+
+    def percentiel(self, naam, p):
+        with self.lock:
+            waarden = sorted(self.histogrammen.get(naam, ()))
+        if not waarden:
+            return None
+        return waarden[min(int(p * len(waarden)), len(waarden) - 1)]
+
+    def prometheus(self):
+        """Alle metingen in het Prometheus-tekstformaat."""
+        regels = []
+        with self.lock:
+            tellers = dict(self.tellers)
+            aantallen = dict(self.aantallen)
+        for naam, waarde in sorted(tellers.items()):
+            regels += [f"# TYPE remindme_{naam}_total counter", f"remindme_{naam}_total {waarde}"]
+        for naam, (aantal, som) in sorted(aantallen.items()):
+            regels.append(f"# TYPE remindme_{naam}_seconds summary")
+            for p in (0.5, 0.95, 0.99):
+                regels.append(f'remindme_{naam}_seconds{{quantile="{p}"}} {self.percentiel(naam, p)}')
+            regels += [f"remindme_{naam}_seconds_count {aantal}", f"remindme_{naam}_seconds_sum {som}"]
+        return "\n".join(regels) + "\n"
+
+    def start_endpoint(self, adres=METRICS_ADRES, poort=METRICS_POORT):
+        """Serveert /metrics in een daemon-thread, voor Prometheus of een curl in het veld."""
+        if not self.aan:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((adres, poort), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        print(f"📈 Metrics op http://{adres}:{poort}/metrics")
+
+    def sluit(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            if self.log is not None:
+                # Eindstand van de tellers, zodat het logbestand op zichzelf te analyseren is
+                self.log.write(json.dumps({"t": round(time.time(), 3), "tellers": self.tellers}) + "\n")
+                self.log.close()
+                self.log = None
+
+metrics = Metrics()
 
 # GPIO-instellingen
 BUZZER_PIN = 27
 LAMPJE_PIN = 22
 KNOP_PIN = 17  # Knop pin
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(BUZZER_PIN, GPIO.OUT)
-GPIO.setup(LAMPJE_PIN, GPIO.OUT)
-GPIO.setup(KNOP_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+KNOP_DEBOUNCE_MS = 30  # Flanken binnen deze tijd zijn contactdender
+DUBBELKLIK_TIJD = 0.4  # Seconden waarbinnen een tweede druk een dubbelklik is
+LANG_INDRUKKEN = 1.0  # Seconden ingedrukt houden voor een lange druk
+SNOOZE_MINUTEN = 5
+
+def init_gpio():
+    """Zet de pinnen klaar; gebeurt in main(), niet bij het importeren."""
+    GPIO.setwarnings(False)  # Schakel GPIO-waarschuwingen uit
+    GPIO.cleanup()
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(BUZZER_PIN, GPIO.OUT)
+    GPIO.setup(LAMPJE_PIN, GPIO.OUT)
+    GPIO.setup(KNOP_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
 # I2C-instellingen voor LCD
 I2C_ADDR = 0x27
-bus = smbus.SMBus(1)
+bus = None  # Geopend in init_lcd()
 LCD_WIDTH = 16
 LCD_CMD = 0
 LCD_CHR = 1
 LCD_BACKLIGHT = 0x08
 ENABLE = 0b00000100
 LCD_LINES = [0x80, 0xC0, 0x94, 0xD4]
-E_DELAY = 0.001
-E_PULSE = 0.0005
+# HD44780-timing volgens de datasheet: enable-puls ≥ 450 ns, gewone commando's 37 µs, clear/home 1,52 ms.
+# Eén I2C-byte duurt op 100 kHz al ~90 µs, dus alleen init en clear/home hebben een echte pauze nodig.
+# Initialisatie via instructies (HD44780-datasheet): >4,1 ms na de eerste 0x3-nibble, >100 us na de tweede
+LCD_INIT_DELAY = 0.0045
+LCD_INIT_DELAY_KORT = 0.00015
+LCD_CLEAR_DELAY = 0.002
+I2C_BLOK = 32  # Maximaal aantal databytes per write_i2c_block_data
+LCD_SCROLL_STAP = 0.35  # Seconden per scrollstap
+LCD_SCROLL_PAUZE = 1.5  # Stilstand op het eerste en laatste frame
+# Tekens die de A00-karakter-ROM zelf heeft
+LCD_ROM_TEKENS = {"ä": 0xE1, "ß": 0xE2, "ñ": 0xEE, "ö": 0xEF, "ü": 0xF5, "°": 0xDF, "→": 0x7E, "←": 0x7F}
+# Eigen 5x8-tekens voor de acht CGRAM-slots, rij voor rij; worden pas geladen als ze nodig zijn
+LCD_GLYPHS = {
+    "é": (0x02, 0x04, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00),
+    "è": (0x08, 0x04, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00),
+    "ë": (0x0A, 0x00, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00),
+    "ê": (0x04, 0x0A, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00),
+    "ï": (0x0A, 0x00, 0x0C, 0x04, 0x04, 0x04, 0x0E, 0x00),
+    "á": (0x02, 0x04, 0x0E, 0x01, 0x0F, 0x11, 0x0F, 0x00),
+    "à": (0x08, 0x04, 0x0E, 0x01, 0x0F, 0x11, 0x0F, 0x00),
+    "ó": (0x02, 0x04, 0x0E, 0x11, 0x11, 0x11, 0x0E, 0x00),
+    "ç": (0x00, 0x0E, 0x10, 0x10, 0x11, 0x0E, 0x04, 0x0C),
+    "🔔": (0x04, 0x0E, 0x0E, 0x0E, 0x1F, 0x00, 0x04, 0x00),
+    "⏰": (0x00, 0x0E, 0x15, 0x17, 0x11, 0x0E, 0x00, 0x00),
+    "✓": (0x00, 0x01, 0x03, 0x16, 0x1C, 0x08, 0x00, 0x00),
+}
 
 # Database-verbinding
-DB_PATH = "herinneringen.db"
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
+DB_PATH = os.environ.get("REMIND_ME_DB", ":memory:" if BACKEND == "nep" else "herinneringen.db")
+ARCHIEF_PATH = os.environ.get("REMIND_ME_ARCHIEF", ":memory:" if BACKEND == "nep" else "verlopen_herinneringen.db")
+# Archief: writes worden gebundeld (hoogstens één commit, dus één fsync, per interval) en oude rijen opgeruimd
+ARCHIEF_SCHRIJF_INTERVAL = 60  # Seconden tussen het wegschrijven van de gebufferde archiefrijen
+ARCHIEF_MAX_DAGEN = 365  # Oudere rijen verdwijnen; het dagoverzicht blijft bewaard
+ARCHIEF_MAX_RIJEN = 20000
+ARCHIEF_ONDERHOUD_INTERVAL = 24 * 3600
+ARCHIEF_VACUUM_PAGINAS = 256  # Vrije pagina's die per onderhoudsbeurt worden teruggegeven
+UITKOMSTEN = ("afgewezen", "gesnoozed", "verlopen", "gemist")
+ARCHIEF_KOLOMMEN = [("afgegaan", "REAL"), ("afgehandeld", "REAL"), ("uitkomst", "TEXT"), ("reactietijd", "REAL"),
+                    ("bron_id", "INTEGER")]
+
+class HerinneringOpslag:
+    """Eén gedeelde SQLite-verbinding (WAL) voor de herinneringen, met het archief eraan ge-ATTACHed.
+
+    Alle toegang loopt via één lock, zodat ook de threads voor de weergave veilig kunnen schrijven.
+    Let op: in WAL-modus is een transactie alleen per databasebestand atomair, niet over het ge-ATTACHte
+    archief heen. Wat van het ene naar het andere bestand gaat, moet dus veilig te herhalen zijn.
+    """
+
+    def __init__(self, pad=DB_PATH, archief_pad=ARCHIEF_PATH):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(pad, check_same_thread=False)
+        self.conn.execute("ATTACH DATABASE ? AS verlopen", (archief_pad,))
+        self.archief_buffer = []  # Afgehandelde herinneringen die nog naar het archief moeten
+        if self.conn.execute("PRAGMA verlopen.auto_vacuum").fetchone()[0] != 2:
+            # Eenmalig: een bestaand archief omzetten, zodat vrije pagina's stukje bij beetje terug kunnen
+            self.conn.execute("PRAGMA verlopen.auto_vacuum = INCREMENTAL")
+            self.conn.execute("VACUUM verlopen")
+        for schema in ("main", "verlopen"):
+            self.conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            self.conn.execute(f"PRAGMA {schema}.synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS herinneringen (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            beschrijving TEXT,
+                            datum TEXT,
+                            tijd TEXT)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_herinneringen_datum_tijd ON herinneringen (datum, tijd)")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS extractie_cache (
+                            sleutel TEXT PRIMARY KEY,
+                            beschrijving TEXT,
+                            dag_soort TEXT,
+                            dag_waarde TEXT,
+                            tijd TEXT,
+                            gebruikt REAL,
+                            treffers INTEGER DEFAULT 0)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_extractie_cache_gebruikt ON extractie_cache (gebruikt)")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS verlopen.verlopen_herinneringen (
+                beschrijving TEXT, datum TEXT, tijd TEXT)''')
+            # Archieven van vóór de uitkomstkolommen bijwerken
+            kolommen = {rij[1] for rij in self.conn.execute("PRAGMA verlopen.table_info(verlopen_herinneringen)")}
+            for kolom, soort in ARCHIEF_KOLOMMEN:
+                if kolom not in kolommen:
+                    self.conn.execute(f"ALTER TABLE verlopen.verlopen_herinneringen ADD COLUMN {kolom} {soort}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS verlopen.idx_verlopen_datum ON verlopen_herinneringen (datum)")
+            # Id uit de herinneringentabel: een half gelukte verplaatsing archiveert een rij geen tweede keer
+            self.conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS verlopen.idx_verlopen_bron
+                                 ON verlopen_herinneringen (bron_id)""")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS verlopen.dagoverzicht (
+                            dag TEXT PRIMARY KEY,
+                            afgegaan INTEGER DEFAULT 0,
+                            afgewezen INTEGER DEFAULT 0,
+                            gesnoozed INTEGER DEFAULT 0,
+                            verlopen INTEGER DEFAULT 0,
+                            gemist INTEGER DEFAULT 0,
+                            reactietijd_som REAL DEFAULT 0,
+                            reacties INTEGER DEFAULT 0)''')
+
+    def voeg_toe(self, beschrijving, datum, tijd):
+        """Slaat een herinnering op en geeft het nieuwe id terug."""
+        with metrics.span("db_voeg_toe"), self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO herinneringen (beschrijving, datum, tijd) VALUES (?, ?, ?)",
+                                       (beschrijving, datum, tijd))
+            return cursor.lastrowid
+
+    def alle(self):
+        with metrics.span("db_alle"), self.lock:
+            return self.conn.execute("SELECT id, beschrijving, datum, tijd FROM herinneringen").fetchall()
+
+    def verwijder(self, herinnering_id):
+        """Haalt een afgegane herinnering uit de planning; het archief volgt later via archiveer_later."""
+        with metrics.span("db_verwijder"), self.lock, self.conn:
+            self.conn.execute("DELETE FROM herinneringen WHERE id = ?", (herinnering_id,))
+
+    def archiveer_later(self, beschrijving, datum, tijd, afgegaan, afgehandeld, uitkomst, reactietijd=None):
+        """Zet een afgehandelde herinnering in de buffer; schrijf_archief bewaart hem."""
+        with self.lock:
+            self.archief_buffer.append((beschrijving, datum, tijd, afgegaan, afgehandeld, uitkomst, reactietijd))
+
+    def _tel_dagen(self, dagen):
+        """Telt per dag {uitkomst: aantal, 'reactietijd_som', 'reacties'} op bij het dagoverzicht."""
+        for dag, telling in dagen.items():
+            self.conn.execute('''INSERT INTO verlopen.dagoverzicht
+                                 (dag, afgegaan, afgewezen, gesnoozed, verlopen, gemist, reactietijd_som, reacties)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                 ON CONFLICT(dag) DO UPDATE SET
+                                 afgegaan = afgegaan + excluded.afgegaan,
+                                 afgewezen = afgewezen + excluded.afgewezen,
+                                 gesnoozed = gesnoozed + excluded.gesnoozed,
+                                 verlopen = verlopen + excluded.verlopen,
+                                 gemist = gemist + excluded.gemist,
+                                 reactietijd_som = reactietijd_som + excluded.reactietijd_som,
+                                 reacties = reacties + excluded.reacties''',
+                              (dag, sum(telling.get(u, 0) for u in UITKOMSTEN if u != "gemist"),
+                               *(telling.get(u, 0) for u in UITKOMSTEN),
+                               telling.get("reactietijd_som", 0.0), telling.get("reacties", 0)))
+
+    def schrijf_archief(self):
+        """Schrijft alle gebufferde archiefrijen en hun dagoverzicht in één transactie weg."""
+        with self.lock:
+            rijen, self.archief_buffer = self.archief_buffer, []
+            if not rijen:
+                return 0
+            dagen = {}
+            for _, _, _, afgegaan, _, uitkomst, reactietijd in rijen:
+                telling = dagen.setdefault(datetime.fromtimestamp(afgegaan).strftime("%Y-%m-%d"), {})
+                telling[uitkomst] = telling.get(uitkomst, 0) + 1
+                if reactietijd is not None:
+                    telling["reactietijd_som"] = telling.get("reactietijd_som", 0.0) + reactietijd
+                    telling["reacties"] = telling.get("reacties", 0) + 1
+            with metrics.span("db_schrijf_archief"), self.conn:
+                self.conn.executemany('''INSERT INTO verlopen.verlopen_herinneringen
+                                         (beschrijving, datum, tijd, afgegaan, afgehandeld, uitkomst, reactietijd)
+                                         VALUES (?, ?, ?, ?, ?, ?, ?)''', rijen)
+                self._tel_dagen(dagen)
+            return len(rijen)
+
+    def archiveer_tot(self, datum, tijd):
+        """Verplaatst alle herinneringen van vóór (datum, tijd) als 'gemist' naar het archief; geeft het aantal terug.
+
+        Archief en herinneringen zijn twee bestanden, dus na een crash kan een rij al gearchiveerd maar nog
+        niet verwijderd zijn. Alleen rijen waarvan het id nog niet in het archief staat worden gekopieerd
+        en geteld; een herhaling na zo'n crash verwijdert dan alleen nog de rest.
+        """
+        waar = "(datum < ? OR (datum = ? AND tijd < ?))"
+        nieuw = "id NOT IN (SELECT bron_id FROM verlopen.verlopen_herinneringen WHERE bron_id IS NOT NULL)"
+        with metrics.span("db_archiveer_tot"), self.lock, self.conn:
+            gemist = self.conn.execute(f"SELECT datum, COUNT(*) FROM herinneringen WHERE {waar} AND {nieuw} GROUP BY datum",
+                                       (datum, datum, tijd)).fetchall()
+            self.conn.execute(f'''INSERT OR IGNORE INTO verlopen.verlopen_herinneringen
+                                  (beschrijving, datum, tijd, uitkomst, bron_id)
+                                  SELECT beschrijving, datum, tijd, 'gemist', id FROM herinneringen WHERE {waar}''',
+                              (datum, datum, tijd))
+            self._tel_dagen({dag: {"gemist": aantal} for dag, aantal in gemist})
+            return self.conn.execute(f"DELETE FROM herinneringen WHERE {waar}", (datum, datum, tijd)).rowcount
+
+    def onderhoud(self, max_dagen=ARCHIEF_MAX_DAGEN, max_rijen=ARCHIEF_MAX_RIJEN):
+        """Past de bewaartermijn toe op het archief en geeft vrije pagina's incrementeel terug."""
+        grens = (datetime.now() - timedelta(days=max_dagen)).strftime("%Y-%m-%d")
+        with metrics.span("db_onderhoud"), self.lock:
+            with self.conn:
+                oud = self.conn.execute("DELETE FROM verlopen.verlopen_herinneringen WHERE datum < ?",
+                                        (grens,)).rowcount
+                teveel = self.conn.execute('''DELETE FROM verlopen.verlopen_herinneringen WHERE rowid NOT IN
+                                              (SELECT rowid FROM verlopen.verlopen_herinneringen
+                                               ORDER BY rowid DESC LIMIT ?)''', (max_rijen,)).rowcount
+            self.conn.execute(f"PRAGMA verlopen.incremental_vacuum({ARCHIEF_VACUUM_PAGINAS})").fetchall()
+        return oud + teveel
+
+    def cache_zoek(self, sleutel):
+        """Geeft het sjabloon (beschrijving, dag_soort, dag_waarde, tijd) en markeert het als recent gebruikt."""
+        with metrics.span("db_cache_zoek"), self.lock, self.conn:
+            rij = self.conn.execute("""SELECT beschrijving, dag_soort, dag_waarde, tijd FROM extractie_cache
+                                       WHERE sleutel = ?""", (sleutel,)).fetchone()
+            if rij is not None:
+                self.conn.execute("UPDATE extractie_cache SET gebruikt = ?, treffers = treffers + 1 WHERE sleutel = ?",
+                                  (time.time(), sleutel))
+            return rij
+
+    def cache_bewaar(self, sleutel, beschrijving, dag_soort, dag_waarde, tijd, maximum):
+        """Slaat een sjabloon op en verwijdert de minst recent gebruikte boven `maximum` stuks."""
+        with metrics.span("db_cache_bewaar"), self.lock, self.conn:
+            self.conn.execute("""INSERT OR REPLACE INTO extractie_cache
+                                 (sleutel, beschrijving, dag_soort, dag_waarde, tijd, gebruikt)
+                                 VALUES (?, ?, ?, ?, ?, ?)""",
+                              (sleutel, beschrijving, dag_soort, dag_waarde, tijd, time.time()))
+            self.conn.execute("""DELETE FROM extractie_cache WHERE sleutel NOT IN
+                                 (SELECT sleutel FROM extractie_cache ORDER BY gebruikt DESC LIMIT ?)""", (maximum,))
+
+    def sluit(self):
+        with self.lock:
+            self.schrijf_archief()
+            self.conn.close()
+
+opslag = None  # Geopend bij de start, zie open_opslag()
+
+def open_opslag():
+    global opslag
+    if opslag is None:
+        opslag = HerinneringOpslag()
+    return opslag
 
 # Globale flags
 stop_flag = False
@@ -52,73 +721,465 @@ herinnering_actief = False
 buzzer_actief = False
 lampje_actief = False
 knop_ingedrukt_count = 0  # Teller voor het aantal keren dat de knop is ingedrukt
+actieve_herinnering = None  # Beschrijving van de herinnering die nu getoond wordt (voor snooze)
+actieve_afloop = None  # Voor het archief: beschrijving, datum, tijd, 'afgegaan' en 'reactie' (eerste knopdruk)
+knop_flanken = None  # asyncio.Queue met (tijdstip, ingedrukt, audiopositie) uit de GPIO-interrupt
+knop_acties = None  # asyncio.Queue met herkende patronen: ('enkel' | 'dubbel' | 'lang', audiopositie)
+
+# Asyncio-runtime: zwaar audiowerk en I2C lopen in eigen executors, zodat de event loop vrij blijft
+audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio")
+lcd_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lcd")
+alarm_taak = None  # Taak die buzzer en lampje laat knipperen
+weergave_taak = None  # Taak die de actieve herinnering op het LCD toont
+spraak_taak = None  # Lopende spraak-naar-herinnering-verwerking
+achtergrond_taken = set()  # Losse taken die niet afgewacht worden, maar ook niet opgeruimd mogen worden
+deepseek_sessie = None  # Gezet zodra de LLM-opstartstap klaar is
+opstart = None  # Opstart: welke subsystemen klaar zijn, gemaakt in main()
 
 # BLE-instellingen
 XIAO_MAC_ADDRESS = "FA:91:CC:45:26:5B"
+XIAO_MAC_ADRESSEN = [XIAO_MAC_ADDRESS]  # Alle XIAO-klokken die een herinnering meekrijgen
 RX_CHARACTERISTIC_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
-ble_client = None  # Globale BLE-client
+TX_CHARACTERISTIC_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
+# Binair commandoprotocol (zie 'Remind Me External.py'); de XIAO antwoordt met een ack via TX
+BLE_PROTOCOL_VERSIE = 1
+PATROON_UIT = 0
+PATROON_KNIPPER = 1
+PATROON_AAN = 2
+BERICHT_ACK = 0xA0
+BERICHT_STATUS = 0xA1
+BLE_STATUS_OK = 0
+BLE_STATUS_VERSIE = 2
+# Versieprobe: nieuwe firmware weigert dit frame met een ack, oude firmware kent alleen '2'/'0' en negeert het
+BLE_VERSIE_PROBE = b"\0"
+# Seconden wachten op een ack voordat een write als mislukt telt; de XIAO luistert maar eens per ~600 ms
+# (slave latency, zie 'Remind Me External.py'), plus een interval voor de ack zelf
+BLE_ACK_TIMEOUT = 2.0
+BLE_BACKOFF_START = 1.0  # Eerste wachttijd na een mislukte verbinding (seconden), verdubbelt daarna
+BLE_BACKOFF_MAX = 60.0
+BLE_KEEPALIVE = 30.0  # Seconden tussen controles of de verbinding nog open is
+BLE_WRITE_TIMEOUT = 5.0  # Zo lang mag een write op een (her)verbinding wachten
+ble_beheer = None  # BLEBeheer, gestart in main()
 
 # Timer voor herinnering (2 minuten)
 HERINNERING_DUUR = 60  # 120 seconden (2 minuten)
+INHAAL_VENSTER = 6 * 3600  # Gemiste herinneringen tot zoveel seconden oud gaan alsnog af
+# De planner kijkt minstens zo vaak opnieuw naar de wandklok, zodat een NTP-correctie na het opstarten
+# (de Pi heeft geen RTC) of een zomertijdwissel een lange wachttijd niet scheef laat lopen
+PLANNER_MAX_WACHT = 30
 
 # Vosk Model (zorg dat het model al gedownload is!)
+VOSK_MODEL_PATH = os.environ.get("REMIND_ME_VOSK_MODEL", "/home/pioneers/vosk_models/vosk-model-small-en-us-0.15")
 model = None
 
 def get_model():
     global model
     if model is None:
         print("📥 Loading VOSK model...")
-        model = Model("/home/pioneers/vosk_models/vosk-model-small-en-us-0.15")
+        model = Model(VOSK_MODEL_PATH)
     return model
 
-recognizer = KaldiRecognizer(get_model(), 16000)
+# Deepseek via de lokale Ollama-server (houdt het model geladen tussen verzoeken)
+OLLAMA_URL = "http://127.0.0.1:11434"
+DEEPSEEK_MODEL = "deepseek-r1:1.5b"
+DEEPSEEK_TIMEOUT = 60  # Maximale duur van één extractie-verzoek (seconden)
+DEEPSEEK_START_TIMEOUT = 20  # Maximale wachttijd tot de server bereikbaar is
+DEEPSEEK_BACKOFF_START = 10.0  # Wachttijd na een mislukte start voordat een verzoek het opnieuw probeert
+DEEPSEEK_BACKOFF_MAX = 300.0
 
 RATE = 16000   # Stel de sample rate in op 16000
 DURATION = 5   # Stel de duur in op 5 seconden
+AUDIO_DEVICE = 2
+
+# Streaming opname: herkennen tijdens het praten, stoppen na stilte
+STREAMING_OPNAME = True
+FRAME_MS = 30  # webrtcvad accepteert frames van 10, 20 of 30 ms
+FRAME_SIZE = RATE * FRAME_MS // 1000
+STILTE_EINDE = 0.8  # Seconden stilte na spraak waarna de opname stopt
+MAX_OPNAME = 10  # Harde bovengrens voor één opname (seconden)
+VAD_PADDING = 1  # Frames rond spraak die behouden blijven (hangover), tegen afgekapte klanken
+
+# Ruisprofiel: eenmalig de ruimte meten, daarna snelle stationaire ruisonderdrukking
+RUISPROFIEL_PATH = "ruisprofiel.npz"
+KALIBRATIE_DUUR = 1.0  # Seconden ruimteruis voor een nieuw profiel
+RUIS_DRIFT_FACTOR = 2.0  # Herkalibreren als het ruisniveau zoveel keer hoger of lager is
+SNR_OVERSLAAN_DB = 20.0  # Vanaf deze signaal-ruisverhouding is ruisonderdrukking niet nodig
+ruisprofiel = None
+
+# Ringbuffer: de microfoon loopt altijd, zodat de eerste lettergreep na de knopdruk niet verloren gaat
+RINGBUFFER_DUUR = 15  # Seconden audio in de ringbuffer
+PRE_ROLL = 0.3  # Seconden vóór de knopdruk die meegenomen worden
+PIEP_NAGALM = 0.15  # Seconden na de piep die ook niet meetellen (bloklatentie van de microfoon en nagalm)
+audio_ring = None
+
+def lees_cpus(waarde):
+    """Leest een CPU-lijst als '2,3' of '1-3'; None (alle kernen) als hij leeg is."""
+    if not waarde:
+        return None
+    cpus = set()
+    for deel in waarde.split(","):
+        van, _, tot = deel.strip().partition("-")
+        cpus.update(range(int(van), int(tot or van) + 1))
+    return cpus
+
+# Audiopijplijn over meerdere kernen: ruisonderdrukking en Vosk in eigen processen, audio via gedeeld
+# geheugen. Staat uit (0) tenzij REMIND_ME_AUDIO_PROCESSEN het aantal ruisonderdrukkingsprocessen geeft.
+AUDIO_PROCESSEN = int(os.environ.get("REMIND_ME_AUDIO_PROCESSEN", "0"))
+STT_PROCESSEN = int(os.environ.get("REMIND_ME_STT_PROCESSEN", "1"))  # Elk Vosk-proces doet één uiting tegelijk
+AUDIO_CPUS = lees_cpus(os.environ.get("REMIND_ME_AUDIO_CPUS"))  # Kernen voor de pijplijnprocessen
+LLM_CPUS = lees_cpus(os.environ.get("REMIND_ME_LLM_CPUS"))  # Kernen voor 'ollama serve' en zijn runners
+CHUNK_FRAMES = 16  # Frames per chunk in de pijplijn (~0,5 s)
+CHUNK_MARGE = 0.1  # Seconden extra audio aan beide kanten van een chunk, tegen randeffecten van de STFT
+MAX_CHUNKS_ONDERWEG = 4  # Zoveel chunks van één uiting mogen tegelijk in de ruisonderdrukking zitten
+MAX_UITINGEN = 2  # Uitingen tegelijk in verwerking; daarboven wordt een knopdruk geweigerd
+STT_WACHTTIJD = RINGBUFFER_DUUR - MAX_OPNAME  # Langer wachten op een vrij Vosk-proces en de audio is weg
+pijplijn = None  # AudioPijplijn, alleen als AUDIO_PROCESSEN > 0
+
+def schrijf_gespiegeld(buffer, capaciteit, positie, data):
+    """Schrijft `data` vanaf sampleteller `positie` in een gespiegelde buffer (zie AudioRing)."""
+    pos = positie % capaciteit
+    deel = min(len(data), capaciteit - pos)
+    for basis in (0, capaciteit):
+        buffer[basis + pos:basis + pos + deel] = data[:deel]
+        buffer[basis:basis + len(data) - deel] = data[deel:]
+
+class AudioRing:
+    """Continue opname in een vooraf gealloceerde ringbuffer.
+
+    Elk sample staat twee keer in de buffer (op i en i + capaciteit), zodat elk venster tot de
+    capaciteit als aaneengesloten view gelezen kan worden, zonder kopie. Posities tellen door sinds
+    de start; een view blijft geldig tot hij na `capaciteit` nieuwe samples overschreven wordt.
+    Met `gedeeld` staat de buffer in gedeeld geheugen, zodat de pijplijnprocessen hem kunnen lezen.
+    """
+
+    def __init__(self, duur=RINGBUFFER_DUUR, samplerate=RATE, device=AUDIO_DEVICE, gedeeld=False):
+        self.samplerate = samplerate
+        self.device = device
+        self.capaciteit = int(duur * samplerate)
+        self.shm = None
+        if gedeeld:
+            self.shm = shared_memory.SharedMemory(create=True, size=2 * self.capaciteit * 2)
+            self.buffer = np.ndarray((2 * self.capaciteit,), dtype=np.int16, buffer=self.shm.buf)
+            self.buffer[:] = 0
+        else:
+            self.buffer = np.zeros(2 * self.capaciteit, dtype=np.int16)
+        self.geschreven = 0
+        self.conditie = threading.Condition()
+        self.stream = None
+
+    def _callback(self, indata, frame_count, time_info, status):
+        data = indata[:, 0]
+        schrijf_gespiegeld(self.buffer, self.capaciteit, self.geschreven, data)
+        with self.conditie:
+            self.geschreven += len(data)
+            self.conditie.notify_all()
+
+    def start(self):
+        self.stream = sd.InputStream(samplerate=self.samplerate, blocksize=FRAME_SIZE, channels=1,
+                                     dtype='int16', device=self.device, callback=self._callback)
+        self.stream.start()
+        print("🎙 Continue opname gestart.")
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if self.shm is not None:
+            self.buffer = None
+            try:
+                self.shm.close()
+            except BufferError:
+                pass  # Er bestaan nog views; het geheugen verdwijnt met het proces
+            self.shm.unlink()
+            self.shm = None
+
+    def positie(self):
+        return self.geschreven
+
+    def wacht_tot(self, positie, timeout=None):
+        """Wacht tot sample `positie` geschreven is; False bij een timeout."""
+        with self.conditie:
+            return self.conditie.wait_for(lambda: self.geschreven >= positie, timeout)
+
+    def venster(self, start, einde):
+        """Zero-copy view op de samples [start, einde); te oude samples worden afgekapt."""
+        start = max(start, self.geschreven - self.capaciteit, 0)
+        begin = start % self.capaciteit
+        return self.buffer[begin:begin + max(einde - start, 0)]
+
+def get_audio_ring():
+    global audio_ring
+    if audio_ring is None:
+        audio_ring = AudioRing(gedeeld=AUDIO_PROCESSEN > 0)
+        audio_ring.start()
+    return audio_ring
 
 # Opname-functie
-def record_audio(duration=DURATION, samplerate=RATE):
-    audio = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype='int16', device=2)
-    sd.wait()
+def record_audio(duration=DURATION, samplerate=RATE, start=None, pre_roll=0.0, piep=None):
+    """Geeft `duration` seconden audio vanaf `start` (standaard nu), plus pre_roll seconden ervoor.
+
+    De samples van de piep (ringposities `piep`, zie buzzer_beep) worden eruit geknipt.
+    """
+    ring = get_audio_ring()
+    start = ring.positie() if start is None else start
+    einde = start + int(duration * samplerate)
+    if not ring.wacht_tot(einde, timeout=duration + 2):
+        print("❌ Microfoon levert geen audio.")
+        return None
     print("✅ Opname klaar.")
-    return np.squeeze(audio)
+    van = max(start - int(pre_roll * samplerate), ring.positie() - ring.capaciteit, 0)
+    audio = ring.venster(van, einde)
+    if piep is None or piep[1] <= van or piep[0] >= einde:
+        return audio
+    return np.concatenate([audio[:max(piep[0] - van, 0)], audio[piep[1] - van:]])
+
+def _piep_frames(positie, aantal, piep):
+    """Masker van de `aantal` frames vanaf ringpositie `positie` die (deels) in de piep vallen."""
+    if piep is None:
+        return np.zeros(aantal, dtype=bool)
+    begin = positie + FRAME_SIZE * np.arange(aantal)
+    return (begin + FRAME_SIZE > piep[0]) & (begin < piep[1])
 
 def speech_to_text(audio):
+    global laatste_herkenning
     print("📝 Converteert spraak naar tekst...")
-    recognizer.AcceptWaveform(audio.tobytes())
-    result = json.loads(recognizer.Result())
-    return result.get("text", "")
+    laatste_herkenning = get_herkenner().herken(audio.tobytes())
+    return laatste_herkenning["text"]
+
+def _frame_rms(audio, frame_size=FRAME_SIZE):
+    """RMS-energie per frame, berekend over een view van de buffer."""
+    aantal = len(audio) // frame_size
+    frames = audio[:aantal * frame_size].reshape(aantal, frame_size)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+
+def kalibreer_ruis(ruis=None, duur=KALIBRATIE_DUUR, samplerate=RATE):
+    """Legt het ruisprofiel van de ruimte vast (nieuwe opname of meegegeven stilte) en slaat het op."""
+    global ruisprofiel
+    if ruis is None:
+        print("🎚 Meet de ruimteruis...")
+        ruis = record_audio(duur, samplerate)
+        if ruis is None:
+            return ruisprofiel
+    ruis = np.asarray(ruis, dtype=np.int16)
+    rms = float(np.sqrt(np.mean(np.square(ruis, dtype=np.float64)))) if len(ruis) else 0.0
+    ruisprofiel = {"ruis": ruis.astype(np.float32), "rms": rms}
+    np.savez(RUISPROFIEL_PATH, ruis=ruis, rms=rms)
+    print(f"🎚 Ruisprofiel opgeslagen (RMS {rms:.0f}).")
+    return ruisprofiel
+
+def laad_ruisprofiel():
+    """Laadt het opgeslagen ruisprofiel; None als er nog geen is."""
+    global ruisprofiel
+    try:
+        with np.load(RUISPROFIEL_PATH) as data:
+            ruisprofiel = {"ruis": data["ruis"].astype(np.float32), "rms": float(data["rms"])}
+    except (OSError, KeyError, ValueError):
+        ruisprofiel = None
+    return ruisprofiel
+
+def _stilste_frames(energie):
+    """De stilste frames van een opname schatten het huidige ruisniveau; geeft (indices, ruis-RMS)."""
+    stilste = np.argsort(energie)[:max(len(energie) // 10, min(len(energie), 16))]
+    return stilste, max(float(np.mean(energie[stilste])), 1.0)
+
+def bewaak_ruisprofiel(audio, samplerate=RATE):
+    """Herkalibreert op de stilste frames van `audio` als er geen profiel is of de ruimte duidelijk
+    stiller/luider geworden is (RUIS_DRIFT_FACTOR)."""
+    energie = _frame_rms(audio)
+    if len(energie) == 0:
+        return ruisprofiel
+    stilste, ruis_rms = _stilste_frames(energie)
+    drift = ruisprofiel is not None and not (
+        1 / RUIS_DRIFT_FACTOR <= ruis_rms / max(ruisprofiel["rms"], 1.0) <= RUIS_DRIFT_FACTOR)
+    if ruisprofiel is None or drift:
+        frames = audio[:len(energie) * FRAME_SIZE].reshape(len(energie), FRAME_SIZE)
+        kalibreer_ruis(frames[np.sort(stilste)].reshape(-1), samplerate=samplerate)
+    return ruisprofiel
 
 def apply_noise_reduction(audio, samplerate=RATE):
+    """Stationaire ruisonderdrukking met het opgeslagen profiel; overgeslagen bij een goede SNR."""
+    energie = _frame_rms(audio)
+    if len(energie) == 0:
+        return audio
+    _, ruis_rms = _stilste_frames(energie)
+    spraak_rms = max(float(np.percentile(energie, 90)), 1.0)
+    snr = 20 * np.log10(spraak_rms / ruis_rms)
+    if snr >= SNR_OVERSLAAN_DB:
+        print(f"🔇 SNR {snr:.0f} dB, ruisonderdrukking overgeslagen.")
+        return audio
+
+    bewaak_ruisprofiel(audio, samplerate)
     print("🔇 Verwijdert ruis...")
-    return nr.reduce_noise(y=audio.astype(np.float32), sr=samplerate, prop_decrease=0.9).astype(np.int16)
+    return _onderdruk(audio, ruisprofiel, samplerate)
+
+def _onderdruk(audio, profiel, samplerate=RATE):
+    return nr.reduce_noise(y=audio.astype(np.float32), sr=samplerate, y_noise=profiel["ruis"],
+                           stationary=True, prop_decrease=0.9).astype(np.int16)
+
+def ontruis_blok(audio, profiel, samplerate=RATE):
+    """Stationaire ruisonderdrukking van één blok met een vast profiel; overgeslagen bij een goede SNR.
 
-def vad_filter(audio, samplerate=RATE):
+    Het profiel is de ruisschatting, dus het blok hoeft zelf geen stilte te bevatten.
+    """
+    energie = _frame_rms(audio)
+    if profiel is None or len(energie) == 0:
+        return audio
+    snr = 20 * np.log10(max(float(np.percentile(energie, 90)), 1.0) / max(profiel["rms"], 1.0))
+    if snr >= SNR_OVERSLAAN_DB:
+        return audio
+    return _onderdruk(audio, profiel, samplerate)
+
+def _verbreed(masker, padding):
+    """Hangover: elk spraakframe neemt `padding` buren aan beide kanten mee."""
+    if not padding:
+        return masker
+    uitgebreid = masker.copy()
+    for k in range(1, padding + 1):
+        uitgebreid[k:] |= masker[:-k]
+        uitgebreid[:-k] |= masker[k:]
+    return uitgebreid
+
+def vad_filter(audio, samplerate=RATE, padding=VAD_PADDING):
+    """Houdt alleen de stemhebbende frames over, plus `padding` frames ervoor en erna.
+
+    Werkt op een view van de buffer: de VAD krijgt per frame een bytes-view en de spraakframes
+    worden in één keer verzameld. Het laatste, onvolledige frame wordt ook beoordeeld.
+    """
     print("🛑 Filtert stiltes en ruis...")
     vad = webrtcvad.Vad(3)
-    frame_size = int(samplerate * 0.03)
-    return np.array([audio[i:i + frame_size] for i in range(0, len(audio) - frame_size, frame_size) if vad.is_speech(audio[i:i + frame_size].tobytes(), samplerate)]).flatten()
-
-def capture_speech():
-    raw_audio = record_audio()
-    if raw_audio is None:
-        return None
-    clean_audio = apply_noise_reduction(raw_audio)
-    speech_audio = vad_filter(clean_audio)
-    recognized_text = speech_to_text(speech_audio)
+    frame_size = int(samplerate * FRAME_MS / 1000)
+    audio = np.ascontiguousarray(audio, dtype=np.int16)
+    volle_frames, rest = divmod(len(audio), frame_size)
+    frames = audio[:volle_frames * frame_size].reshape(volle_frames, frame_size)
+    bytes_view = memoryview(audio).toreadonly().cast("B")
+    stap = frame_size * audio.itemsize
+
+    masker = np.fromiter(
+        (vad.is_speech(bytes_view[i * stap:(i + 1) * stap], samplerate) for i in range(volle_frames)),
+        dtype=bool, count=volle_frames
+    )
+    if rest:
+        # De VAD accepteert alleen hele frames: vul het staartje aan met stilte
+        staart = np.zeros(frame_size, dtype=np.int16)
+        staart[:rest] = audio[volle_frames * frame_size:]
+        masker = np.append(masker, vad.is_speech(staart.tobytes(), samplerate))
+    masker = _verbreed(masker, padding)
+
+    spraak_frames = int(np.count_nonzero(masker[:volle_frames]))
+    staart_mee = bool(rest) and bool(masker[-1])
+    uit = np.empty(spraak_frames * frame_size + (rest if staart_mee else 0), dtype=np.int16)
+    np.compress(masker[:volle_frames], frames, axis=0,
+                out=uit[:spraak_frames * frame_size].reshape(spraak_frames, frame_size))
+    if staart_mee:
+        uit[spraak_frames * frame_size:] = audio[volle_frames * frame_size:]
+    return uit
+
+def stream_speech(start=None, samplerate=RATE, stilte_einde=STILTE_EINDE, max_duur=MAX_OPNAME, piep=None):
+    """Herkent spraak blok voor blok uit de ringbuffer, vanaf PRE_ROLL seconden vóór `start`.
+
+    Elk blok van CHUNK_FRAMES frames gaat eerst door de stationaire ruisonderdrukking met het
+    opgeslagen profiel (met CHUNK_MARGE marge tegen randeffecten van de STFT). Daarna gaan de
+    stemhebbende frames direct naar Vosk; de opname stopt na stilte_einde seconden stilte na de
+    spraak, of na DURATION seconden als er helemaal niets gezegd wordt. Frames van de piep tellen
+    nergens mee: niet als spraak, niet als stilte en niet voor Vosk. Spraak in de pre-roll gaat wel
+    naar Vosk, maar alleen spraak na de piep start de eindedetectie.
+    """
+    global laatste_herkenning
+    ring = get_audio_ring()
+    start = ring.positie() if start is None else start
+    positie = eerste = max(start - int(PRE_ROLL * samplerate), ring.positie() - ring.capaciteit, 0)
+    blok = CHUNK_FRAMES * FRAME_SIZE
+    marge = int(CHUNK_MARGE * samplerate)
 
-    if recognized_text:
-        print(f"🗣 Herkende tekst: {recognized_text}")
+    vad = webrtcvad.Vad(3)
+    max_stille_frames = int(stilte_einde * 1000 / FRAME_MS)
+    stille_frames = 0
+    spraak_gehoord = False
+    na_piep = piep[1] if piep is not None else 0
+    herkenner = get_herkenner()
+    herkenner.begin()
+
+    begin = time.time()
+    klaar = False
+    while not klaar and time.time() - begin < max_duur:
+        if not ring.wacht_tot(positie + blok + marge, timeout=0.5):
+            continue
+        van = max(positie - marge, ring.positie() - ring.capaciteit, 0)
+        audio = ontruis_blok(ring.venster(van, positie + blok + marge), ruisprofiel, samplerate)
+        schoon = np.ascontiguousarray(audio[positie - van:positie - van + blok])
+        in_piep = _piep_frames(positie, CHUNK_FRAMES, piep)
+        for frame, overslaan in zip(schoon.reshape(-1, FRAME_SIZE), in_piep):
+            positie += FRAME_SIZE
+            if overslaan:
+                continue
+            frame = frame.tobytes()
+            if vad.is_speech(frame, samplerate):
+                spraak_gehoord = spraak_gehoord or positie - FRAME_SIZE >= na_piep
+                stille_frames = 0
+                herkenner.voeg_toe(frame)
+            elif spraak_gehoord:
+                stille_frames += 1
+                if stille_frames >= max_stille_frames:
+                    klaar = True
+                    break
+            elif positie - start >= DURATION * samplerate:
+                klaar = True
+                break
+
+    print(f"✅ Opname klaar na {(positie - start) / samplerate:.1f} seconden.")
+    laatste_herkenning = herkenner.einde()
+    # Het profiel voor de volgende uiting bijwerken als de ruimte veranderd is (of er nog geen was)
+    bewaak_ruisprofiel(ring.venster(max(eerste, ring.positie() - ring.capaciteit), positie), samplerate)
+    return laatste_herkenning["text"]
+
+def capture_speech(start=None, piep=None):
+    """Zet spraak vanaf ringbufferpositie `start` (het moment van de knopdruk) om naar tekst, zonder de piep."""
+    if STREAMING_OPNAME:
+        # Opname en herkenning lopen door elkaar heen en zijn dus één span
+        with metrics.span("opname_stt"):
+            stream_speech(start, piep=piep)
+    else:
+        with metrics.span("opname"):
+            raw_audio = record_audio(start=start, pre_roll=PRE_ROLL, piep=piep)
+        if raw_audio is None:
+            return None
+        with metrics.span("ruisonderdrukking"):
+            clean_audio = apply_noise_reduction(raw_audio)
+        with metrics.span("vad"):
+            speech_audio = vad_filter(clean_audio)
+        with metrics.span("stt"):
+            speech_to_text(speech_audio)
+    return meld_herkenning(laatste_herkenning)
+
+def meld_herkenning(herkenning):
+    """Meldt de herkende tekst (met de laagste woordzekerheid); geeft de tekst terug, of None."""
+    global laatste_herkenning
+    laatste_herkenning = herkenning
+    if herkenning and herkenning["text"]:
+        recognized_text = herkenning["text"]
+        zekerheden = [woord["conf"] for woord in herkenning["woorden"] if "conf" in woord]
+        if zekerheden:
+            print(f"🗣 Herkende tekst: {recognized_text} (laagste zekerheid {min(zekerheden):.2f})")
+        else:
+            print(f"🗣 Herkende tekst: {recognized_text}")
         return recognized_text
     else:
         print("❌ Geen spraak gedetecteerd. Probeer opnieuw.")
         return None
 
-def buzzer_beep():
-    """Laat de buzzer een korte piep geven."""
+async def buzzer_beep():
+    """Laat de buzzer een korte piep geven; geeft de ringbufferposities (van, tot) van de piep terug.
+
+    De VAD houdt een piep voor spraak, dus de opname moet die posities overslaan.
+    """
+    van = audio_ring.positie() if audio_ring is not None else None
     GPIO.output(BUZZER_PIN, GPIO.HIGH)
-    sleep(0.2)  # Piep voor 0.2 seconden
+    await asyncio.sleep(0.2)  # Piep voor 0.2 seconden
     GPIO.output(BUZZER_PIN, GPIO.LOW)
+    if van is None:
+        return None
+    return van, audio_ring.positie() + int(PIEP_NAGALM * RATE)
 
 def activate_virtualenv():
     print("Activating virtual environment...")
@@ -128,18 +1189,159 @@ def activate_virtualenv():
     except subprocess.CalledProcessError as e:
         print(f"Error activating virtual environment: {e}")
 
+class DeepseekSessie:
+    """Langlevende sessie met de Ollama-server, zodat het model tussen herinneringen warm blijft."""
+
+    def __init__(self, model=DEEPSEEK_MODEL, url=OLLAMA_URL, timeout=DEEPSEEK_TIMEOUT):
+        self.model = model
+        self.url = url
+        self.timeout = timeout
+        self.server = None  # 'ollama serve'-proces, alleen als we het zelf gestart hebben
+        self.lock = threading.Lock()  # Eén verzoek tegelijk naar het model
+        self.start_lock = threading.Lock()  # Eén (her)startpoging tegelijk
+        self.laatste_tokens = 0  # Tokens tot de match bij het laatste verzoek (voor prompt-tuning)
+        self.gestart = False  # True zodra start() en warm_op() één keer gelukt zijn
+        self.volgende_poging = 0.0  # time.time() waarna zorg_gestart() het opnieuw mag proberen
+        self.backoff = DEEPSEEK_BACKOFF_START
+
+    def _bereikbaar(self):
+        try:
+            with urllib.request.urlopen(f"{self.url}/api/version", timeout=1) as resp:
+                return resp.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def _verzoek(self, pad, payload):
+        return urllib.request.Request(
+            f"{self.url}{pad}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def _post(self, pad, payload, timeout=None):
+        with urllib.request.urlopen(self._verzoek(pad, payload), timeout=timeout or self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def _stream(self, payload, stream_filter):
+        """Leest de output token voor token; sluit de verbinding zodra het filter een resultaat heeft."""
+        deadline = time.time() + self.timeout
+        tekst = []
+        with urllib.request.urlopen(self._verzoek("/api/generate", payload), timeout=self.timeout) as resp:
+            for regel in resp:
+                if not regel.strip():
+                    continue
+                deel = json.loads(regel)
+                token = deel.get("response", "")
+                tekst.append(token)
+                # Het sluiten van de verbinding laat Ollama de generatie afbreken
+                if stream_filter is not None and stream_filter.voeg_toe(token):
+                    break
+                if deel.get("done"):
+                    break
+                if time.time() > deadline:
+                    raise TimeoutError("Deepseek-verzoek duurde te lang")
+        return "".join(tekst)
+
+    def start(self):
+        """Start 'ollama serve' als er nog geen server draait en wacht tot hij antwoordt."""
+        if self._bereikbaar():
+            return True
+        if self.server is None or self.server.poll() is not None:
+            self.server = subprocess.Popen(
+                ["ollama", "serve"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            if LLM_CPUS and hasattr(os, "sched_setaffinity"):
+                # De runners die het model laden erven de affiniteit van de server
+                os.sched_setaffinity(self.server.pid, LLM_CPUS)
+            print("Deepseek-server wordt gestart.")
+        deadline = time.time() + DEEPSEEK_START_TIMEOUT
+        while time.time() < deadline:
+            if self._bereikbaar():
+                return True
+            if self.server.poll() is not None:
+                break
+            time.sleep(0.2)
+        print("❌ Deepseek-server reageert niet.")
+        return False
+
+    def warm_op(self):
+        """Laadt het model vooraf in het geheugen; een lege prompt laadt alleen het model."""
+        try:
+            self._post("/api/generate", {"model": self.model, "prompt": "", "keep_alive": -1})
+            print("🔥 Deepseek-model is geladen.")
+            return True
+        except Exception as e:
+            print(f"Error warming up Deepseek: {e}")
+            return False
+
+    def zorg_gestart(self):
+        """Start de server (opnieuw) als dat bij het opstarten niet lukte, met exponentiële backoff.
+
+        Ollama kan bij het booten nog onbereikbaar of traag zijn; dan probeert het volgende verzoek
+        het opnieuw in plaats van de sessie voor de rest van het proces op te geven.
+        """
+        with self.start_lock:
+            if self.gestart:
+                return True
+            if time.time() < self.volgende_poging:
+                return False
+            try:
+                self.gestart = self.start() and self.warm_op()
+            except Exception as e:
+                print(f"Error starting Deepseek: {e}")
+            if self.gestart:
+                self.backoff = DEEPSEEK_BACKOFF_START
+                return True
+            self.volgende_poging = time.time() + self.backoff
+            print(f"⚠️ Deepseek niet beschikbaar, volgende poging over {self.backoff:.0f} s.")
+            self.backoff = min(self.backoff * 2, DEEPSEEK_BACKOFF_MAX)
+            return False
+
+    def genereer(self, prompt, stream_filter=None):
+        """Stuurt één prompt naar het model en geeft de gelezen output terug, of None bij een fout.
+
+        Met een stream_filter stopt het lezen (en de generatie) zodra het filter een resultaat heeft.
+        """
+        payload = {"model": self.model, "prompt": prompt, "stream": True, "keep_alive": -1}
+        with self.lock:
+            for poging in range(2):
+                try:
+                    return self._stream(payload, stream_filter)
+                except urllib.error.HTTPError as e:
+                    print(f"❌ Deepseek weigert het verzoek: {e}")
+                    return None
+                except (TimeoutError, urllib.error.URLError, ConnectionError) as e:
+                    if isinstance(e, TimeoutError) or isinstance(getattr(e, "reason", None), TimeoutError):
+                        print(f"❌ Deepseek reageerde niet binnen {self.timeout} seconden.")
+                        return None
+                    # Server gecrasht of gestopt: eenmalig herstarten en het verzoek opnieuw proberen
+                    print(f"⚠️ Deepseek-server onbereikbaar ({e}), herstart...")
+                    if poging > 0 or not self.start():
+                        return None
+                    self.warm_op()
+        return None
+
+    def stop(self):
+        if self.server is not None and self.server.poll() is None:
+            self.server.terminate()
+            try:
+                self.server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.server.kill()
+        self.server = None
+
 def run_deepseek():
-    """Start Deepseek proces, dit is nu in de achtergrond om de snelheid van spraakherkenning te verhogen."""
+    """Start de Deepseek-sessie en warmt het model op, zodat elke herinnering een warm model treft.
+
+    Ook als de server nog niet bereikbaar is komt de sessie terug; zorg_gestart() probeert het later opnieuw.
+    """
     try:
-        process = subprocess.Popen(
-            ["ollama", "run", "deepseek-r1:1.5b"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        print("Deepseek is starting.")
-        return process
+        sessie = NepDeepseekSessie() if BACKEND == "nep" else DeepseekSessie()
+        if sessie.zorg_gestart():
+            print("Deepseek is ready.")
+        return sessie
     except Exception as e:
         print(f"Error starting Deepseek: {e}")
         return None
@@ -159,34 +1361,872 @@ def filter_text(text):
         return beschrijving, datum, tijd
     return None
 
+class StreamFilter:
+    """Streamende variant van filter_text: zoekt het tuple terwijl de tokens binnenkomen."""
+
+    def __init__(self):
+        self.tekst = ""
+        self.tokens = 0  # Aantal tokens gelezen tot (en met) de match
+        self.resultaat = None
+
+    def voeg_toe(self, token):
+        """Voegt een token toe; geeft True terug zodra een geldig (beschrijving, datum, tijd) gevonden is."""
+        if self.resultaat is not None:
+            return True
+        self.tokens += 1
+        self.tekst += token
+        # Alleen opnieuw zoeken als het tuple net afgesloten kan zijn. deepseek-r1 schrijft tijdens het
+        # redeneren kladversies van het tuple in <think>; alleen wat na </think> komt is het antwoord.
+        if ")" in token:
+            if "</think>" in self.tekst:
+                self.resultaat = filter_text(self.tekst.rpartition("</think>")[2])
+            elif "<think>" not in self.tekst:
+                self.resultaat = filter_text(self.tekst)
+        return self.resultaat is not None
+
+# Regelgebaseerde extractie (snelle route vóór Deepseek): Vosk (en-us) levert kleine letters en uitgeschreven getallen
+LOKAAL_MIN_ZEKERHEID = 0.8  # Lager dan dit gaat de tekst alsnog naar Deepseek
+
+GETALLEN = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "a": 1, "an": 1,
+}
+TIENTALLEN = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50}
+RANGTELWOORDEN = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13,
+    "fourteenth": 14, "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18,
+    "nineteenth": 19, "twentieth": 20, "thirtieth": 30,
+}
+WEEKDAGEN = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MAANDEN = ["january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december"]
+DAGDELEN = [
+    (("a", "m"), "am"), (("am",), "am"), (("p", "m"), "pm"), (("pm",), "pm"),
+    (("in", "the", "morning"), "am"), (("in", "the", "afternoon"), "pm"),
+    (("in", "the", "evening"), "pm"), (("at", "night"), "pm"),
+]
+DAGDEEL_WOORDEN = {"morning": "am", "afternoon": "pm", "evening": "pm", "night": "pm"}
+INLEIDINGEN = [
+    ("remind", "me", "to"), ("remind", "me", "that"), ("remind", "me"), ("please",),
+    ("i", "need", "to"), ("i", "have", "to"), ("don't", "forget", "to"), ("set", "a", "reminder", "to"),
+]
+LOSSE_VOORZETSELS = {"at", "on", "in", "by", "around", "to", "for", "the", "and"}
+
+def _lees_getal(woorden, i):
+    """Leest een uitgesproken getal tot 59 vanaf positie i; geeft (waarde, aantal woorden) of None."""
+    if i >= len(woorden):
+        return None
+    w = woorden[i]
+    if w.isdigit():
+        return int(w), 1
+    if w in TIENTALLEN:
+        if i + 1 < len(woorden) and woorden[i + 1] in GETALLEN and 1 <= GETALLEN[woorden[i + 1]] <= 9 \
+                and woorden[i + 1] not in ("a", "an", "oh"):
+            return TIENTALLEN[w] + GETALLEN[woorden[i + 1]], 2
+        return TIENTALLEN[w], 1
+    if w in GETALLEN and w not in ("a", "an", "oh"):
+        return GETALLEN[w], 1
+    return None
+
+def _lees_rangtelwoord(woorden, i):
+    """Leest een dag van de maand ('third', 'twenty first', '3'); geeft (dag, aantal woorden) of None."""
+    if i >= len(woorden):
+        return None
+    w = woorden[i]
+    if w.isdigit() and 1 <= int(w) <= 31:
+        return int(w), 1
+    if w in RANGTELWOORDEN:
+        return RANGTELWOORDEN[w], 1
+    if w in TIENTALLEN and i + 1 < len(woorden) and woorden[i + 1] in RANGTELWOORDEN:
+        dag = TIENTALLEN[w] + RANGTELWOORDEN[woorden[i + 1]]
+        if dag <= 31:
+            return dag, 2
+    return None
+
+def _lees_dagdeel(woorden, i):
+    """Herkent 'a m', 'pm', 'in the morning', ... vanaf positie i; geeft (dagdeel, aantal woorden)."""
+    for patroon, dagdeel in DAGDELEN:
+        if tuple(woorden[i:i + len(patroon)]) == patroon:
+            return dagdeel, len(patroon)
+    return None, 0
+
+def _lees_tijd(woorden, i):
+    """Herkent een kloktijd vanaf positie i.
+
+    Geeft (uur, minuut, dagdeel, aantal woorden, expliciet) of None. 'expliciet' is waar als de woorden
+    zonder voorafgaand 'at' al duidelijk een tijd zijn (half past, o'clock, p m, noon).
+    """
+    if i >= len(woorden):
+        return None
+    w = woorden[i]
+    if w in ("noon", "midday"):
+        return 12, 0, "pm", 1, True
+    if w == "midnight":
+        return 0, 0, "am", 1, True
+
+    # half past five, quarter to six, ten past seven, twenty minutes to eight
+    j = i + 1 if w == "a" else i
+    minuut = None
+    if j < len(woorden) and woorden[j] == "half":
+        minuut, j = 30, j + 1
+    elif j < len(woorden) and woorden[j] == "quarter":
+        minuut, j = 15, j + 1
+    elif w != "a":
+        getal = _lees_getal(woorden, j)
+        if getal and 1 <= getal[0] <= 59:
+            minuut, j = getal[0], j + getal[1]
+    if minuut is not None:
+        if j < len(woorden) and woorden[j] in ("minute", "minutes"):
+            j += 1
+        if j < len(woorden) and woorden[j] in ("past", "after", "to", "before"):
+            richting = woorden[j]
+            uur = _lees_getal(woorden, j + 1)
+            if uur and 1 <= uur[0] <= 12:
+                u, m = uur[0], minuut
+                if richting in ("to", "before"):
+                    u, m = (u - 1) or 12, 60 - minuut
+                j += 1 + uur[1]
+                dagdeel, n = _lees_dagdeel(woorden, j)
+                return u, m, dagdeel, j + n - i, True
+
+    # five thirty, seven oh five, five o'clock, seventeen hundred, five p m
+    uur = _lees_getal(woorden, i)
+    if not uur or uur[0] > 23:
+        return None
+    j = i + uur[1]
+    minuut, expliciet = 0, False
+    volgende = woorden[j] if j < len(woorden) else ""
+    if volgende in ("o'clock", "oclock", "hundred"):
+        j, expliciet = j + 1, True
+    elif volgende == "oh" and j + 1 < len(woorden) and 1 <= GETALLEN.get(woorden[j + 1], -1) <= 9:
+        minuut, j = GETALLEN[woorden[j + 1]], j + 2
+    else:
+        getal = _lees_getal(woorden, j)
+        if getal and 10 <= getal[0] <= 59:
+            minuut, j = getal[0], j + getal[1]
+    dagdeel, n = _lees_dagdeel(woorden, j)
+    if dagdeel and uur[0] > 12:
+        return None
+    return uur[0], minuut, dagdeel, j + n - i, expliciet or dagdeel is not None
+
+def _normaliseer(tekst):
+    tekst = tekst.lower().replace("-", " ")
+    tekst = re.sub(r"(\d{1,2}):(\d{2})", r"\1 \2", tekst)
+    tekst = re.sub(r"(\d+)(st|nd|rd|th)\b", r"\1", tekst)
+    tekst = tekst.replace("a.m.", "a m").replace("p.m.", "p m")
+    return re.sub(r"[^a-z0-9' ]", " ", tekst).split()
+
+def parse_lokaal(tekst, nu=None):
+    """Haalt (beschrijving, datum, tijd) zonder LLM uit een Engelse zin.
+
+    Geeft (resultaat, zekerheid) terug; resultaat is None als er geen tijd of beschrijving gevonden is.
+    Relatieve datums worden vanaf 'nu' berekend, dus het jaartal klopt altijd.
+    """
+    nu = nu or datetime.now()
+    woorden = _normaliseer(tekst)
+    gebruikt = [False] * len(woorden)
+    zekerheid = 1.0
+
+    for inleiding in INLEIDINGEN:
+        if tuple(woorden[:len(inleiding)]) == inleiding:
+            gebruikt[:len(inleiding)] = [True] * len(inleiding)
+            break
+
+    def markeer(start, aantal):
+        gebruikt[start:start + aantal] = [True] * aantal
+
+    dag = None  # Datum als date-object
+    dagdeel_hint = None
+    tijd = None  # (uur, minuut, dagdeel)
+    i = 0
+    while i < len(woorden):
+        if gebruikt[i]:
+            i += 1
+            continue
+        w = woorden[i]
+        volgende = woorden[i + 1] if i + 1 < len(woorden) else ""
+
+        # Relatieve tijd: in ten minutes, in an hour, in half an hour, in two days
+        if w == "in" and dag is None and tijd is None:
+            j = i + 1
+            if volgende == "half" and woorden[i + 2:i + 4] == ["an", "hour"]:
+                moment = nu + timedelta(minutes=30)
+                dag, tijd = moment.date(), (moment.hour, moment.minute, "24")  # "24": al in 24-uursnotatie
+                markeer(i, 4)
+                i += 4
+                continue
+            getal = _lees_getal(woorden, j) or ((1, 1) if volgende in ("a", "an") else None)
+            if getal:
+                eenheid = woorden[j + getal[1]] if j + getal[1] < len(woorden) else ""
+                delta = {"minute": timedelta(minutes=getal[0]), "minutes": timedelta(minutes=getal[0]),
+                         "hour": timedelta(hours=getal[0]), "hours": timedelta(hours=getal[0])}.get(eenheid)
+                if delta:
+                    moment = nu + delta
+                    dag, tijd = moment.date(), (moment.hour, moment.minute, "24")
+                    markeer(i, 2 + getal[1])
+                    i += 2 + getal[1]
+                    continue
+                dagen = {"day": 1, "days": 1, "week": 7, "weeks": 7}.get(eenheid)
+                if dagen:
+                    dag = nu.date() + timedelta(days=getal[0] * dagen)
+                    markeer(i, 2 + getal[1])
+                    i += 2 + getal[1]
+                    continue
+
+        # Datums: today, tonight, tomorrow (morning), the day after tomorrow, next week
+        if dag is None:
+            aantal, offset = 0, None
+            if w == "today":
+                aantal, offset = 1, 0
+            elif w == "tonight":
+                aantal, offset, dagdeel_hint = 1, 0, "pm"
+            elif w == "this" and volgende in DAGDEEL_WOORDEN:
+                aantal, offset, dagdeel_hint = 2, 0, DAGDEEL_WOORDEN[volgende]
+            elif w == "tomorrow":
+                aantal, offset = 1, 1
+            elif woorden[i:i + 4] == ["the", "day", "after", "tomorrow"]:
+                aantal, offset = 4, 2
+            elif woorden[i:i + 3] == ["day", "after", "tomorrow"]:
+                aantal, offset = 3, 2
+            elif w == "next" and volgende == "week":
+                aantal, offset = 2, 7
+            if aantal:
+                dag = nu.date() + timedelta(days=offset)
+                if i + aantal < len(woorden) and woorden[i + aantal] in DAGDEEL_WOORDEN:
+                    dagdeel_hint = DAGDEEL_WOORDEN[woorden[i + aantal]]
+                    aantal += 1
+                start = i - 1 if i > 0 and woorden[i - 1] in ("on", "by") and not gebruikt[i - 1] else i
+                markeer(start, i + aantal - start)
+                i += aantal
+                continue
+
+            # Weekdagen: on friday, next monday, this sunday evening
+            start = i
+            if w in ("on", "next", "this", "coming") and volgende in WEEKDAGEN:
+                i += 1
+                w = volgende
+            if w in WEEKDAGEN:
+                dagen = (WEEKDAGEN.index(w) - nu.weekday()) % 7 or 7
+                dag = nu.date() + timedelta(days=dagen)
+                einde = i + 1
+                if einde < len(woorden) and woorden[einde] in DAGDEEL_WOORDEN:
+                    dagdeel_hint = DAGDEEL_WOORDEN[woorden[einde]]
+                    einde += 1
+                markeer(start, einde - start)
+                i = einde
+                continue
+            i = start
+            w = woorden[i]
+
+            # Kalenderdatums: march third, the third of march, on the fifth
+            j = i + 1 if w == "on" else i
+            j = j + 1 if woorden[j:j + 1] == ["the"] else j
+            maand = dagnummer = None
+            if j < len(woorden) and woorden[j] in MAANDEN:
+                k = j + 2 if woorden[j + 1:j + 2] == ["the"] else j + 1
+                dagnummer = _lees_rangtelwoord(woorden, k)
+                if dagnummer:
+                    maand, einde = MAANDEN.index(woorden[j]) + 1, k + dagnummer[1]
+            elif j < len(woorden) and (not woorden[j].isdigit() or j > i):
+                dagnummer = _lees_rangtelwoord(woorden, j)
+                if dagnummer:
+                    einde = j + dagnummer[1]
+                    if woorden[einde:einde + 1] == ["of"] and woorden[einde + 1:einde + 2] \
+                            and woorden[einde + 1] in MAANDEN:
+                        maand, einde = MAANDEN.index(woorden[einde + 1]) + 1, einde + 2
+                    else:
+                        maand = 0  # Alleen een dag van de maand: deze of volgende maand
+            if maand is not None:
+                dag = _kalenderdatum(nu.date(), maand, dagnummer[0])
+                if dag is not None:
+                    markeer(i, einde - i)
+                    i = einde
+                    continue
+
+        # Losse dagdelen: in the morning, at night
+        dagdeel, aantal = _lees_dagdeel(woorden, i)
+        if aantal > 1 and dagdeel_hint is None:
+            dagdeel_hint = dagdeel
+            markeer(i, aantal)
+            i += aantal
+            continue
+
+        # Kloktijden: at five thirty, half past six, at noon
+        if tijd is None:
+            start = i + 1 if w in ("at", "around", "by", "about") else i
+            gevonden = _lees_tijd(woorden, start)
+            if gevonden and (gevonden[4] or start > i):
+                uur, minuut, dagdeel, aantal, _ = gevonden
+                tijd = (uur, minuut, dagdeel)
+                markeer(i, start - i + aantal)
+                i = start + aantal
+                continue
+        i += 1
+
+    if tijd is None:
+        return None, 0.0
+
+    beschrijving_woorden = [w for w, weg in zip(woorden, gebruikt) if not weg]
+    while beschrijving_woorden and beschrijving_woorden[0] in LOSSE_VOORZETSELS:
+        beschrijving_woorden.pop(0)
+    while beschrijving_woorden and beschrijving_woorden[-1] in LOSSE_VOORZETSELS:
+        beschrijving_woorden.pop()
+    if not beschrijving_woorden:
+        return None, 0.0
+    # Overgebleven tijdwoorden wijzen op een zin die de regels niet volledig begrepen hebben
+    tijdwoorden = set(GETALLEN) | set(TIENTALLEN) | set(WEEKDAGEN) | set(MAANDEN) | set(DAGDEEL_WOORDEN) \
+        | {"today", "tomorrow", "tonight", "noon", "midnight", "o'clock", "am", "pm", "half", "quarter"}
+    if any(w in tijdwoorden - {"a", "an"} or w.isdigit() for w in beschrijving_woorden):
+        zekerheid = min(zekerheid, 0.5)
+    if len(beschrijving_woorden) > 6:
+        zekerheid = min(zekerheid, 0.7)
+
+    uur, minuut, dagdeel = tijd
+    dagdeel = dagdeel or dagdeel_hint
+    if not 0 <= minuut <= 59:
+        return None, 0.0
+    if dagdeel == "pm" and uur < 12:
+        uur += 12
+    elif dagdeel == "am" and uur == 12:
+        uur = 0
+    elif dagdeel is None and 1 <= uur <= 11:
+        # Geen am/pm: kies het eerstvolgende moment vandaag, anders een gangbaar tijdstip
+        kandidaten = [u for u in (uur, uur + 12) if (u, minuut) > (nu.hour, nu.minute)]
+        if dag in (None, nu.date()) and kandidaten:
+            uur, dag = kandidaten[0], nu.date()
+        else:
+            uur = uur + 12 if uur <= 6 else uur
+            zekerheid = min(zekerheid, 0.9)
+    if uur > 23:
+        return None, 0.0
+    if dag is None:
+        dag = nu.date() if (uur, minuut) > (nu.hour, nu.minute) else nu.date() + timedelta(days=1)
+    elif (dag, uur, minuut) < (nu.date(), nu.hour, nu.minute):
+        # Genoemde dag, maar het moment is al voorbij ("today at nine a m" om 14:00): niet zelf
+        # doorschuiven, want dan klopt de genoemde dag niet meer; Deepseek mag het proberen
+        zekerheid = min(zekerheid, 0.3)
+
+    beschrijving = " ".join(beschrijving_woorden)
+    return (beschrijving, dag.strftime("%Y-%m-%d"), f"{uur:02d}:{minuut:02d}"), zekerheid
+
+def _kalenderdatum(vandaag, maand, dag):
+    """Eerstvolgende geldige datum voor (maand, dag); maand 0 betekent deze of volgende maand."""
+    for stap in range(0, 13 if maand == 0 else 2):
+        if maand == 0:
+            jaar, m = divmod(vandaag.month - 1 + stap, 12)
+            jaar, m = vandaag.year + jaar, m + 1
+        else:
+            jaar, m = vandaag.year + stap, maand
+        try:
+            kandidaat = vandaag.replace(year=jaar, month=m, day=dag)
+        except ValueError:
+            continue
+        if kandidaat >= vandaag:
+            return kandidaat
+    return None
+
+# Extractiecache: herhaalde zinnen slaan Deepseek over
+EXTRACTIE_CACHE_MAX = 500  # Maximaal aantal sjablonen; de minst recent gebruikte vallen eruit
+RELATIEVE_TIJDWOORDEN = {"minute", "minutes", "hour", "hours"}  # "in twintig minuten" hangt af van het moment zelf
+
+class ExtractieCache:
+    """LRU-cache in SQLite van genormaliseerde zin naar een relatief sjabloon.
+
+    Het sjabloon bewaart de dag als afstand tot vandaag, als weekdag, als kalenderdatum of als "geen"
+    (afhankelijk van hoe de zin hem noemde) en wordt bij een treffer opnieuw op de huidige datum toegepast,
+    nooit op een moment dat al voorbij is.
+    """
+
+    def __init__(self, maximum=EXTRACTIE_CACHE_MAX):
+        self.maximum = maximum
+        self.treffers = 0
+        self.missers = 0
+
+    def _sjabloon(self, woorden, datum, vandaag):
+        """Bepaalt hoe de zin de dag noemde; geeft (soort, waarde) of None als dat niet te zeggen is."""
+        dagen = (datum - vandaag).days
+        for i, w in enumerate(woorden):
+            volgende = woorden[i + 1] if i + 1 < len(woorden) else ""
+            # Relatieve dagen eerst: "the first aid kit tomorrow" is morgen, niet de eerste van de maand
+            if w in ("today", "tonight", "tomorrow") or woorden[i:i + 2] in (["next", "week"], ["after", "tomorrow"]) \
+                    or (w == "this" and volgende in DAGDEEL_WOORDEN):
+                return "offset", str(dagen)
+            if w == "in":
+                getal = _lees_getal(woorden, i + 1) or ((1, 1) if volgende in ("a", "an") else None)
+                if getal and woorden[i + 1 + getal[1]:i + 2 + getal[1]] in (["day"], ["days"], ["week"], ["weeks"]):
+                    return "offset", str(dagen)
+        for i, w in enumerate(woorden):
+            if w in WEEKDAGEN and WEEKDAGEN.index(w) == datum.weekday():
+                return "weekdag", str(datum.weekday())
+            # Kalenderdatum alleen als het woord echt als datum gelezen kan worden: "may" of "second" alleen niet
+            if w in MAANDEN and MAANDEN.index(w) + 1 == datum.month:
+                k = i + 2 if woorden[i + 1:i + 2] == ["the"] else i + 1
+                if (_lees_rangtelwoord(woorden, k) or (None,))[0] == datum.day:
+                    return "datum", f"{datum.month}-{datum.day}"
+            dagnummer = _lees_rangtelwoord(woorden, i + 1) if w == "the" else None
+            if dagnummer and dagnummer[0] == datum.day:
+                einde = i + 1 + dagnummer[1]
+                if woorden[einde:einde + 1] == ["of"] and woorden[einde + 1:einde + 2] \
+                        and woorden[einde + 1] in MAANDEN:
+                    return "datum", f"{datum.month}-{datum.day}"  # "the third of march"
+                return "datum", f"0-{datum.day}"  # "on the fifth": deze of volgende maand
+        if dagen <= 1:
+            return "geen", ""  # Geen dag genoemd: eerstvolgende keer dat de tijd langskomt
+        return None  # Dag op een manier genoemd die we niet herkennen: niet cachen
+
+    def zoek(self, tekst, nu=None):
+        """Geeft (beschrijving, datum, tijd) voor een eerder geziene zin, of None."""
+        nu = nu or datetime.now()
+        rij = opslag.cache_zoek(" ".join(_normaliseer(tekst)))
+        datum = None
+        if rij is not None:
+            beschrijving, soort, waarde, tijd = rij
+            vandaag = nu.date()
+            if soort == "weekdag":
+                datum = vandaag + timedelta(days=(int(waarde) - vandaag.weekday()) % 7)
+                if datetime.strptime(f"{datum} {tijd}", "%Y-%m-%d %H:%M") < nu:
+                    datum += timedelta(days=7)
+            elif soort == "datum":
+                maand, dag = map(int, waarde.split("-"))
+                datum = _kalenderdatum(vandaag, maand, dag)
+                if datum is not None and datetime.strptime(f"{datum} {tijd}", "%Y-%m-%d %H:%M") < nu:
+                    datum = _kalenderdatum(vandaag + timedelta(days=1), maand, dag)
+            else:
+                datum = vandaag + timedelta(days=int(waarde or 0))
+                if datetime.strptime(f"{datum} {tijd}", "%Y-%m-%d %H:%M") < nu:
+                    datum += timedelta(days=1)  # Tijd van vandaag al voorbij: morgen
+        if datum is None:
+            self.missers += 1
+            metrics.tel("extractie_cache_missers")
+            return None
+        self.treffers += 1
+        metrics.tel("extractie_cache_treffers")
+        return beschrijving, datum.strftime("%Y-%m-%d"), tijd
+
+    def bewaar(self, tekst, resultaat, nu=None):
+        woorden = _normaliseer(tekst)
+        if RELATIEVE_TIJDWOORDEN & set(woorden):
+            return
+        beschrijving, datum, tijd = resultaat
+        vandaag = (nu or datetime.now()).date()
+        try:
+            datum = datetime.strptime(datum, "%Y-%m-%d").date()
+        except ValueError:
+            return
+        if datum < vandaag:
+            return  # Een datum in het verleden is een fout van het model, geen sjabloon
+        sjabloon = self._sjabloon(woorden, datum, vandaag)
+        if sjabloon is None:
+            return
+        soort, waarde = sjabloon
+        opslag.cache_bewaar(" ".join(woorden), beschrijving, soort, waarde, tijd, self.maximum)
+
+    def statistieken(self):
+        totaal = self.treffers + self.missers
+        return {"treffers": self.treffers, "missers": self.missers,
+                "hitrate": round(self.treffers / totaal, 3) if totaal else None}
+
+extractie_cache = ExtractieCache()
+
+# Grammatica-modus: Vosk zoekt alleen in de herinneringswoordenschat, wat op de Pi sneller en nauwkeuriger
+# decodeert. Onbekende woorden komen als [unk] terug en worden los met het open model herkend.
+VOSK_GRAMMATICA = True
+TAAKWOORDEN = [
+    "buy", "milk", "bread", "call", "mom", "dad", "take", "medicine", "pills", "water", "the", "plants",
+    "feed", "cat", "dog", "walk", "go", "to", "doctor", "dentist", "gym", "work", "school", "pick", "up",
+    "kids", "meeting", "appointment", "pay", "bills", "rent", "clean", "house", "room", "kitchen", "cook",
+    "dinner", "lunch", "breakfast", "wash", "clothes", "laundry", "shopping", "groceries", "study", "homework",
+    "check", "email", "send", "letter", "birthday", "party", "visit", "grandma", "grandpa", "friend", "trash",
+    "out", "charge", "phone", "bring", "book", "library", "train", "bus", "car", "my", "his", "her", "for",
+]
+UNK_MARGE = 0.15  # Seconden extra audio rond een [unk]-stuk bij het opnieuw herkennen
+
+def reminder_woordenschat():
+    """Alle woorden die parse_lokaal kent, plus de taakwoorden: de vaste basis van de grammatica."""
+    woorden = set(GETALLEN) | set(TIENTALLEN) | set(RANGTELWOORDEN) | set(WEEKDAGEN) | set(MAANDEN)
+    woorden |= set(DAGDEEL_WOORDEN) | LOSSE_VOORZETSELS | set(TAAKWOORDEN)
+    for frase, _ in DAGDELEN:
+        woorden |= set(frase)
+    for inleiding in INLEIDINGEN:
+        woorden |= set(inleiding)
+    woorden |= {"today", "tonight", "tomorrow", "next", "this", "coming", "day", "days", "week", "weeks",
+                "hour", "hours", "minute", "minutes", "half", "quarter", "past", "of", "o'clock", "noon",
+                "midday", "midnight", "hundred", "about", "after", "before", "reminder", "set", "remind", "me"}
+    return woorden
+
+class SpraakHerkenner:
+    """Twee herbruikbare Vosk-recognizers op één model: een met de herinneringsgrammatica en een open.
+
+    Per uiting: begin(), voeg_toe() per stuk audio, einde(). De grammatica groeit met de woorden uit
+    opgeslagen beschrijvingen (leer), zodat herhaalde taken zonder [unk] herkend worden.
+    """
+
+    def __init__(self, model, samplerate=RATE, grammatica=VOSK_GRAMMATICA):
+        self.samplerate = samplerate
+        self.open = KaldiRecognizer(model, samplerate)
+        self.open.SetWords(True)
+        self.woorden = reminder_woordenschat()
+        self.gewijzigd = False
+        self.beperkt = None
+        if grammatica:
+            self.beperkt = KaldiRecognizer(model, samplerate, self._grammatica())
+            self.beperkt.SetWords(True)
+        self.lock = threading.Lock()  # leer() kan vanuit een andere thread komen dan de opname
+        self.audio = bytearray()  # Audio van de huidige uiting, voor het opnieuw herkennen van [unk]
+        self.gevoed = {}  # recognizer -> samples sinds zijn aanmaak
+
+    def _grammatica(self):
+        return json.dumps(sorted(self.woorden) + ["[unk]"])
+
+    def _actief(self):
+        return self.beperkt if self.beperkt is not None else self.open
+
+    def leer(self, tekst):
+        """Neemt de woorden van een beschrijving op in de grammatica (vanaf de volgende uiting)."""
+        nieuw = set(tekst.lower().split()) - self.woorden
+        if nieuw:
+            with self.lock:
+                self.woorden |= nieuw
+                self.gewijzigd = True
+
+    def begin(self):
+        with self.lock:
+            if self.beperkt is not None and self.gewijzigd and hasattr(self.beperkt, "SetGrammar"):
+                self.beperkt.SetGrammar(self._grammatica())
+                self.gewijzigd = False
+        self._actief().Reset()
+        self.audio.clear()
+        self.basis = self.gevoed.get(self._actief(), 0)
+
+    def _voer(self, rec, data):
+        rec.AcceptWaveform(data)
+        self.gevoed[rec] = self.gevoed.get(rec, 0) + len(data) // 2
+
+    def voeg_toe(self, data):
+        self._voer(self._actief(), data)
+        self.audio += data
+
+    def _relatief(self, woorden, basis):
+        """Zet tijden om naar seconden vanaf `basis` samples. Vosk telt ze door over Reset heen,
+        maar niet elke versie doet dat; een woord dat vóór de basis zou beginnen verraadt het."""
+        seconden = basis / self.samplerate
+        if woorden and woorden[0]["start"] >= seconden - UNK_MARGE:
+            for woord in woorden:
+                woord["start"] = round(woord["start"] - seconden, 3)
+                woord["end"] = round(woord["end"] - seconden, 3)
+        return woorden
+
+    def einde(self):
+        """Sluit de uiting af; geeft {'text', 'woorden'} met per woord start, einde (s) en zekerheid."""
+        resultaat = json.loads(self._actief().FinalResult())
+        woorden = self._relatief(resultaat.get("result", []), self.basis)
+        if any(woord["word"] == "[unk]" for woord in woorden):
+            woorden = self._herstel_unk(woorden)
+            tekst = " ".join(woord["word"] for woord in woorden if woord["word"] != "[unk]")
+        else:
+            tekst = resultaat.get("text", "")
+        return {"text": tekst, "woorden": woorden}
+
+    def herken(self, data):
+        self.begin()
+        self.voeg_toe(data)
+        return self.einde()
+
+    def _herstel_unk(self, woorden):
+        """Herkent aaneengesloten [unk]-stukken opnieuw met het open model, op basis van de tijdstempels."""
+        resultaat, i = [], 0
+        while i < len(woorden):
+            if woorden[i]["word"] != "[unk]":
+                resultaat.append(woorden[i])
+                i += 1
+                continue
+            j = i
+            while j + 1 < len(woorden) and woorden[j + 1]["word"] == "[unk]":
+                j += 1
+            van = max(woorden[i]["start"] - UNK_MARGE, 0.0)
+            tot = woorden[j]["end"] + UNK_MARGE
+            stuk = bytes(self.audio[int(van * self.samplerate) * 2:int(tot * self.samplerate) * 2])
+            self.open.Reset()
+            basis = self.gevoed.get(self.open, 0)
+            self._voer(self.open, stuk)
+            hersteld = self._relatief(json.loads(self.open.FinalResult()).get("result", []), basis)
+            metrics.tel("stt_unk_hersteld")
+            for woord in hersteld:
+                # Van tijden binnen het stuk naar tijden binnen de uiting
+                woord["start"] = round(woord["start"] + van, 3)
+                woord["end"] = round(woord["end"] + van, 3)
+            resultaat += hersteld or woorden[i:j + 1]
+            i = j + 1
+        return resultaat
+
+herkenner = None
+herkenner_lock = threading.Lock()
+laatste_herkenning = None  # {'text', 'woorden'} van de laatste uiting, met tijdstempels en zekerheden
+
+def get_herkenner():
+    """Laadt het Vosk-model bij het eerste gebruik (of in de opstartstap) in plaats van bij het importeren."""
+    global herkenner
+    with herkenner_lock:
+        if herkenner is None:
+            herkenner = SpraakHerkenner(get_model())
+            leer_beschrijvingen()
+    return herkenner
+
+def leer_woorden(tekst):
+    """Neemt de woorden van `tekst` op in de grammatica, hier en in de Vosk-processen van de pijplijn."""
+    if herkenner is not None:
+        herkenner.leer(tekst)
+    if pijplijn is not None:
+        pijplijn.leer(tekst)
+
+def leer_beschrijvingen():
+    """Voegt de woorden van alle opgeslagen herinneringen toe aan de grammatica, zodra beide geladen zijn."""
+    if (herkenner is not None or pijplijn is not None) and opslag is not None:
+        for _, beschrijving, _, _ in opslag.alle():
+            leer_woorden(beschrijving)
+
+# Pijplijnprocessen: gestart met spawn, dus ze importeren dit bestand opnieuw; de staat staat in `werker`
+werker = None
+
+def _werker_start(ring_naam, uit_naam, capaciteit, profiel_pad, cpus, stt):
+    """Initializer van een pijplijnproces: kernen vastleggen, gedeeld geheugen koppelen, Vosk laden."""
+    global werker, RUISPROFIEL_PATH
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    RUISPROFIEL_PATH = profiel_pad
+    ring_shm = shared_memory.SharedMemory(name=ring_naam)
+    uit_shm = shared_memory.SharedMemory(name=uit_naam)
+    werker = {
+        "shm": (ring_shm, uit_shm),  # Vasthouden, anders wordt het geheugen onder de views losgekoppeld
+        "ring": np.ndarray((2 * capaciteit,), dtype=np.int16, buffer=ring_shm.buf),
+        "uit": np.ndarray((2 * capaciteit,), dtype=np.int16, buffer=uit_shm.buf),
+        "capaciteit": capaciteit,
+        "vad": webrtcvad.Vad(3),
+        "profiel_tijd": None,
+        "herkenner": SpraakHerkenner(get_model()) if stt else None,
+    }
+
+def _werker_klaar():
+    return True
+
+def _werker_ruisprofiel():
+    """Laadt het ruisprofiel opnieuw als het hoofdproces intussen geherkalibreerd heeft."""
+    try:
+        tijd = os.stat(RUISPROFIEL_PATH).st_mtime
+    except OSError:
+        return None
+    if tijd != werker["profiel_tijd"]:
+        werker["profiel_tijd"] = tijd
+        laad_ruisprofiel()
+    return ruisprofiel
+
+def _ruis_chunk(van, start, einde, tot):
+    """Ruisonderdrukking en VAD op [start, einde), met [van, tot) als marge voor de STFT.
+
+    Leest uit de gedeelde ringbuffer en schrijft het resultaat op dezelfde posities in de gedeelde
+    uitvoerbuffer; alleen het VAD-masker en de duur gaan terug naar het hoofdproces.
+    """
+    begin = time.perf_counter()
+    capaciteit = werker["capaciteit"]
+    audio = werker["ring"][van % capaciteit:van % capaciteit + tot - van]
+    audio = ontruis_blok(audio, _werker_ruisprofiel())
+    schoon = audio[start - van:einde - van]
+    schrijf_gespiegeld(werker["uit"], capaciteit, start, schoon)
+    masker = [werker["vad"].is_speech(frame.tobytes(), RATE) for frame in schoon.reshape(-1, FRAME_SIZE)]
+    return masker, time.perf_counter() - begin
+
+def _stt_begin(woorden):
+    """Begint een uiting, met de woorden die het hoofdproces sinds de start geleerd heeft."""
+    herkenner = werker["herkenner"]
+    if woorden:
+        herkenner.leer(" ".join(woorden))
+    herkenner.begin()
+
+def _stt_chunk(start, einde, masker):
+    """Voert de stemhebbende frames van een ontruiste chunk uit de uitvoerbuffer aan Vosk."""
+    begin = time.perf_counter()
+    capaciteit = werker["capaciteit"]
+    audio = werker["uit"][start % capaciteit:start % capaciteit + einde - start]
+    spraak = audio.reshape(-1, FRAME_SIZE)[np.asarray(masker, dtype=bool)]
+    if len(spraak):
+        werker["herkenner"].voeg_toe(spraak.tobytes())
+    return time.perf_counter() - begin
+
+def _stt_einde():
+    begin = time.perf_counter()
+    return werker["herkenner"].einde(), time.perf_counter() - begin
+
+class AudioPijplijn:
+    """Spraakherkenning verdeeld over processen, zodat ruisonderdrukking en Vosk op eigen kernen lopen.
+
+    De ringbuffer en een even grote uitvoerbuffer staan in gedeeld geheugen; tussen de processen gaan
+    alleen posities en VAD-maskers. Een uiting gaat in chunks door de pijplijn: terwijl Vosk chunk k
+    decodeert, zitten de volgende chunks al in de ruisonderdrukking. Back-pressure: per uiting zijn
+    hoogstens MAX_CHUNKS_ONDERWEG chunks onderweg, elke uiting wacht op een vrij Vosk-proces en
+    boven MAX_UITINGEN uitingen wordt een knopdruk geweigerd.
+    """
+
+    def __init__(self, ring, ruis_processen=AUDIO_PROCESSEN, stt_processen=STT_PROCESSEN, cpus=AUDIO_CPUS):
+        self.ring = ring
+        self.uit_shm = shared_memory.SharedMemory(create=True, size=ring.buffer.nbytes)
+        context = multiprocessing.get_context("spawn")  # fork naast lopende threads is niet veilig
+        args = (ring.shm.name, self.uit_shm.name, ring.capaciteit, RUISPROFIEL_PATH, cpus)
+        self.ruis_processen = ruis_processen
+        self.ruis = ProcessPoolExecutor(ruis_processen, mp_context=context,
+                                        initializer=_werker_start, initargs=args + (False,))
+        self.stt = [ProcessPoolExecutor(1, mp_context=context, initializer=_werker_start, initargs=args + (True,))
+                    for _ in range(stt_processen)]
+        self.vrije_stt = None  # asyncio.Queue met Vosk-processen die geen uiting hebben, gemaakt in start()
+        self.woorden = set()  # Geleerde woorden; elke uiting neemt ze mee naar zijn Vosk-proces
+        self.lock = threading.Lock()  # leer() komt uit executor-threads
+        self.uitingen = 0
+
+    async def start(self):
+        """Start alle processen en wacht tot ze het gedeelde geheugen en het Vosk-model geladen hebben."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.ruis, _werker_klaar) for _ in range(self.ruis_processen)),
+                             *(loop.run_in_executor(stt, _werker_klaar) for stt in self.stt))
+        self.vrije_stt = asyncio.Queue()
+        for stt in self.stt:
+            self.vrije_stt.put_nowait(stt)
+        return self
+
+    def leer(self, tekst):
+        with self.lock:
+            self.woorden |= set(tekst.lower().split())
+
+    def vol(self):
+        return self.uitingen >= MAX_UITINGEN
+
+    def start_uiting(self, coro):
+        """Start de verwerking van een uiting als achtergrondtaak en telt hem mee tot hij klaar is."""
+        self.uitingen += 1
+        taak = achtergrond(coro)
+        taak.add_done_callback(self._uiting_klaar)
+        return taak
+
+    def _uiting_klaar(self, taak):
+        self.uitingen -= 1
+
+    async def herken(self, start=None, samplerate=RATE, stilte_einde=STILTE_EINDE, max_duur=MAX_OPNAME, piep=None):
+        """Als stream_speech, maar over de processen verdeeld; geeft {'text', 'woorden'} of None."""
+        loop = asyncio.get_running_loop()
+        ring = self.ring
+        start = ring.positie() if start is None else start
+        chunk = CHUNK_FRAMES * FRAME_SIZE
+        marge = int(CHUNK_MARGE * samplerate)
+        volgende = max(start - int(PRE_ROLL * samplerate), ring.positie() - ring.capaciteit + marge, 0)
+        einde_opname = start + int(max_duur * samplerate)
+        max_stille_frames = int(stilte_einde * 1000 / FRAME_MS)
+        stille_frames = 0
+        spraak_gehoord = False
+        gestopt = False
+        onderweg = deque()  # (positie, future) van chunks in de ruisonderdrukking, op volgorde
+        staart = np.zeros(0, dtype=bool)  # Laatste VAD-frames van de vorige chunk, voor de hangover
+        stt = None
+        stt_taken = []
+        positie = eerste = volgende
+        try:
+            while not gestopt or onderweg:
+                # Elke opgenomen chunk (plus marge) gaat meteen naar een vrij ruisonderdrukkingsproces
+                while not gestopt and len(onderweg) < MAX_CHUNKS_ONDERWEG \
+                        and ring.positie() >= volgende + chunk + marge:
+                    van = max(volgende - marge, ring.positie() - ring.capaciteit, 0)
+                    onderweg.append((volgende, loop.run_in_executor(
+                        self.ruis, _ruis_chunk, van, volgende, volgende + chunk, volgende + chunk + marge)))
+                    volgende += chunk
+                    gestopt = volgende >= einde_opname
+                if not onderweg:
+                    if not await loop.run_in_executor(None, ring.wacht_tot, volgende + chunk + marge, 2.0):
+                        print("❌ Microfoon levert geen audio.")
+                        return None
+                    continue
+
+                positie, future = onderweg.popleft()
+                masker, duur = await future
+                metrics.meet("ruisonderdrukking", duur)
+                in_piep = _piep_frames(positie, len(masker), piep)
+                masker = np.asarray(masker, dtype=bool) & ~in_piep
+                uitgebreid = _verbreed(np.concatenate([staart, masker]), VAD_PADDING)[len(staart):] & ~in_piep
+                staart = masker[len(masker) - VAD_PADDING:]
+                if stt is None:
+                    stt = await asyncio.wait_for(self.vrije_stt.get(), STT_WACHTTIJD)
+                    with self.lock:
+                        woorden = sorted(self.woorden)
+                    stt_taken.append(loop.run_in_executor(stt, _stt_begin, woorden))
+                # Niet afwachten: het Vosk-proces werkt zijn wachtrij op volgorde af
+                stt_taken.append(loop.run_in_executor(stt, _stt_chunk, positie, positie + chunk, uitgebreid.tolist()))
+
+                # Einde van de uiting zoals in stream_speech: stilte na spraak, of helemaal geen spraak.
+                # Alleen frames na de piep tellen mee, pre-roll en piep gaan hooguit naar Vosk.
+                na_piep = positie + FRAME_SIZE * np.arange(len(masker)) >= (piep[1] if piep is not None else 0)
+                for spraak in masker[na_piep]:
+                    if spraak:
+                        spraak_gehoord = True
+                        stille_frames = 0
+                    elif spraak_gehoord:
+                        stille_frames += 1
+                if (spraak_gehoord and stille_frames >= max_stille_frames) or \
+                        (not spraak_gehoord and positie + chunk - start >= DURATION * samplerate):
+                    gestopt = True
+                    onderweg.clear()  # Audio van na het einde hoeft niet meer naar Vosk
+
+            if stt is None:
+                return None
+            print(f"✅ Opname klaar na {(positie + chunk - start) / samplerate:.1f} seconden.")
+            stt_duren = await asyncio.gather(*stt_taken)
+            resultaat, duur = await loop.run_in_executor(stt, _stt_einde)
+            metrics.meet("stt", sum(d for d in stt_duren if d) + duur)
+            # Profiel bijwerken zoals in stream_speech; de werkers laden het nieuwe bestand zelf in
+            venster = ring.venster(max(eerste, ring.positie() - ring.capaciteit), positie + chunk).copy()
+            await loop.run_in_executor(None, bewaak_ruisprofiel, venster, samplerate)
+            return resultaat
+        except asyncio.TimeoutError:
+            print("⏳ Alle Vosk-processen zijn bezet, opname overgeslagen.")
+            metrics.tel("pijplijn_geweigerd")
+            return None
+        finally:
+            if stt is not None:
+                self.vrije_stt.put_nowait(stt)
+
+    def stop(self):
+        self.ruis.shutdown(wait=True, cancel_futures=True)
+        for stt in self.stt:
+            stt.shutdown(wait=True, cancel_futures=True)
+        self.uit_shm.close()
+        self.uit_shm.unlink()
+
+async def start_pijplijn():
+    """Opstartstap 'vosk' in pijplijnmodus: start de processen zodra de (gedeelde) ringbuffer er is."""
+    global pijplijn
+    await opstart.wacht("audio")
+    pijplijn = await AudioPijplijn(audio_ring).start()
+    leer_beschrijvingen()
+    print(f"🧵 Audiopijplijn: {AUDIO_PROCESSEN} ruisonderdrukkings- en {STT_PROCESSEN} Vosk-processen.")
+    return pijplijn
+
 def voeg_herinnering_toe(beschrijving, datum, tijd):
     """Voegt een herinnering toe aan de database."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-
-        c.execute('''CREATE TABLE IF NOT EXISTS herinneringen (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        beschrijving TEXT,
-                        datum TEXT,
-                        tijd TEXT)''')
-
-        c.execute("INSERT INTO herinneringen (beschrijving, datum, tijd) VALUES (?, ?, ?)",
-                  (beschrijving, datum, tijd))
-        conn.commit()
-        conn.close()
+        herinnering_id = opslag.voeg_toe(beschrijving, datum, tijd)
+        planner.voeg_toe(herinnering_id, beschrijving, datum, tijd)
+        leer_woorden(beschrijving)
         print(f"✅ Herinnering opgeslagen: {beschrijving} op {datum} om {tijd}.")
         return True
     except Exception as e:
         print(f"❌ Fout bij opslaan in database: {e}")
         return False
 
-def send_to_deepseek(process, user_input):
+def send_to_deepseek(sessie, user_input):
     """Stuurt de tekst naar Deepseek voor extractie."""
-    if process is None:
-        print("Deepseek process is not running. Exiting.")
+    if sessie is None or not sessie.zorg_gestart():
+        print("Deepseek session is not running. Exiting.")
         return None
 
+    vandaag = datetime.now()
     text = f"""
     Extract the following information from this text:
 
@@ -196,105 +2236,340 @@ def send_to_deepseek(process, user_input):
     (DESCRIPTION, DATE, TIME)
 
     DESCRIPTION: The main task in 1-4 essential words (do not include time or date).
-    DATE: In YYYY-MM-DD format. (YYYY is always 2025)
+    DATE: In YYYY-MM-DD format. Today is {vandaag:%A %Y-%m-%d}; resolve words like "tomorrow" from today.
     TIME: In 24-hour HH:MM format. (Never include letters)
     """
 
     try:
         print("🧠 Verstuurt data naar Deepseek...")
-        process.stdin.write(text + "\n")
-        process.stdin.flush()
-
-        stdout, stderr = process.communicate()
+        stream_filter = StreamFilter()
+        with metrics.span("llm"):
+            output = sessie.genereer(text, stream_filter)
 
-        if process.returncode == 0:
+        if output is not None:
             print("Deepseek output ontvangen:")
-            print(stdout)
-            resultaat = filter_text(stdout)
-            if resultaat:
-                return resultaat
+            print(output)
+            sessie.laatste_tokens = stream_filter.tokens
+            metrics.tel("llm_tokens", stream_filter.tokens)
+            if stream_filter.resultaat:
+                print(f"⏱ Tuple gevonden na {stream_filter.tokens} tokens.")
+                return stream_filter.resultaat
         print("❌ Fout in Deepseek-output.")
+        metrics.tel("llm_fouten")
         return None
     except Exception as e:
         print(f"Error sending data to Deepseek: {e}")
+        metrics.tel("llm_fouten")
         return None
 
+def extraheer_herinnering(sessie, tekst):
+    """Probeert eerst de lokale regels en valt alleen bij lage zekerheid terug op Deepseek."""
+    with metrics.span("extractie_lokaal"):
+        resultaat, zekerheid = parse_lokaal(tekst)
+    if resultaat and zekerheid >= LOKAAL_MIN_ZEKERHEID:
+        print(f"⚡ Lokaal herkend (zekerheid {zekerheid:.1f}): {resultaat}")
+        metrics.tel("extracties_lokaal")
+        return resultaat
+    resultaat = extractie_cache.zoek(tekst)
+    if resultaat:
+        print(f"♻️ Uit de cache: {resultaat}")
+        return resultaat
+    metrics.tel("extracties_deepseek")
+    resultaat = send_to_deepseek(sessie, tekst)
+    if resultaat:
+        extractie_cache.bewaar(tekst, resultaat)
+    return resultaat
+
 # LCD-functies
+class LCD:
+    """HD44780 achter een PCF8574-backpack, met een schaduw-framebuffer.
+
+    Alleen cellen die echt veranderen worden verstuurd. Elke nibble is data|E gevolgd door data
+    (de vallende flank klokt hem in); een setup-byte vooraf is alleen nodig als RS wisselt.
+    Alles gaat samen in write_i2c_block_data-bursts over de bus.
+    De framebuffer bevat tekencodes zoals ze in DDRAM staan; 0-7 zijn de CGRAM-slots.
+    """
+
+    def __init__(self, bus, adres=I2C_ADDR, breedte=LCD_WIDTH, regels=len(LCD_LINES)):
+        self.bus = bus
+        self.adres = adres
+        self.breedte = breedte
+        self.scherm = [[0x20] * breedte for _ in range(regels)]
+        self.cgram = [None] * 8  # Welk teken in welk CGRAM-slot staat
+        self.vastgezet = set()  # Slots die een lopende scroll nog nodig heeft
+        self.poort = None  # Laatste byte op de PCF8574-uitgangen, None = onbekend
+        self.cursor = None  # (regel, kolom) waar de adresteller van de controller staat, None = onbekend
+        self.wachtrij = []
+        self.bytes_verstuurd = 0
+        self.lock = threading.RLock()  # De klok en de herinneringsweergave schrijven vanuit verschillende threads
+
+    def _nibble(self, nibble, mode):
+        byte = mode | nibble | LCD_BACKLIGHT
+        if self.poort is None or self.poort & 0x0F != mode | LCD_BACKLIGHT:
+            self.wachtrij.append(byte)  # RS moet al vóór de stijgende flank van E staan
+        self.wachtrij += [byte | ENABLE, byte]
+        self.poort = byte
+
+    def _nibbles(self, data, mode):
+        for nibble in (data & 0xF0, (data << 4) & 0xF0):
+            self._nibble(nibble, mode)
+
+    def flush(self):
+        """Verstuurt de wachtrij in zo min mogelijk I2C-transacties."""
+        rij, self.wachtrij = self.wachtrij, []
+        for i in range(0, len(rij), I2C_BLOK + 1):
+            blok = rij[i:i + I2C_BLOK + 1]
+            if len(blok) == 1:
+                self.bus.write_byte(self.adres, blok[0])
+            else:
+                self.bus.write_i2c_block_data(self.adres, blok[0], blok[1:])
+        self.bytes_verstuurd += len(rij)
+        metrics.tel("i2c_bytes", len(rij))
+
+    def commando(self, cmd):
+        with self.lock:
+            self._nibbles(cmd, LCD_CMD)
+            if cmd in (0x01, 0x02):  # Clear en home zijn de enige trage commando's
+                self.flush()
+                time.sleep(LCD_CLEAR_DELAY)
+                self.cursor = (0, 0)
+                if cmd == 0x01:
+                    self.scherm = [[0x20] * self.breedte for _ in self.scherm]
+            elif cmd & 0x80:
+                adres = cmd & 0x7F
+                self.cursor = next(((r, adres - (LCD_LINES[r] & 0x7F)) for r in range(len(self.scherm))
+                                    if 0 <= adres - (LCD_LINES[r] & 0x7F) < self.breedte), None)
+            else:
+                self.cursor = None
+
+    def schrijf_byte(self, data, mode):
+        """Ruwe byte naar de controller; de framebuffer kan daarna niet meer op de cursor rekenen."""
+        with self.lock:
+            self._nibbles(data, mode)
+            self.cursor = None
+            self.flush()
+
+    def init(self):
+        with self.lock:
+            self.poort = None
+            # Omschakelen naar 4-bit modus: elke nibble apart versturen en de minimale pauze afwachten,
+            # want in één burst liggen ze maar ~45-180 us uit elkaar
+            for nibble, pauze in ((0x30, LCD_INIT_DELAY), (0x30, LCD_INIT_DELAY_KORT),
+                                  (0x30, LCD_INIT_DELAY_KORT), (0x20, LCD_INIT_DELAY_KORT)):
+                self._nibble(nibble, LCD_CMD)
+                self.flush()
+                time.sleep(pauze)
+            for cmd in (0x06, 0x0C, 0x28):
+                self.commando(cmd)
+            self.commando(0x01)
+            self.cgram = [None] * 8  # CGRAM-inhoud is na power-on onbepaald
+
+    def _laad_glyph(self, teken, bezet):
+        """Zet `teken` in een CGRAM-slot; slots die zichtbaar, vastgezet of in `bezet` zijn blijven staan."""
+        if teken in self.cgram:
+            return self.cgram.index(teken)
+        zichtbaar = {code for regel in self.scherm for code in regel if code < 8}
+        vrij = [slot for slot in range(8) if slot not in zichtbaar | self.vastgezet | bezet]
+        if not vrij:
+            return None
+        slot = min(vrij, key=lambda s: self.cgram[s] is not None)  # Lege slots eerst
+        self.commando(0x40 | slot << 3)  # Adresteller naar CGRAM; de cursor is daarna onbekend
+        for rij in LCD_GLYPHS[teken]:
+            self._nibbles(rij, LCD_CHR)
+        self.cgram[slot] = teken
+        return slot
+
+    def codeer(self, tekst):
+        """Tekst naar DDRAM-codes: ASCII en ROM-tekens direct, accenten en iconen via CGRAM.
+
+        Past een teken nergens in (of zijn alle slots bezet), dan wordt het zonder accent getoond.
+        """
+        with self.lock:
+            codes, bezet = [], set()
+            for teken in tekst:
+                if " " <= teken <= "}":
+                    code = ord(teken)
+                elif teken in LCD_ROM_TEKENS:
+                    code = LCD_ROM_TEKENS[teken]
+                else:
+                    code = self._laad_glyph(teken, bezet) if teken in LCD_GLYPHS else None
+                    if code is None:
+                        kaal = unicodedata.normalize("NFKD", teken)
+                        code = ord(next((c for c in kaal if " " <= c <= "}"), "?"))
+                    else:
+                        bezet.add(code)
+                codes.append(code)
+            if self.wachtrij:
+                self.flush()
+            return codes
+
+    def toon(self, regel, tekst):
+        """Zet `tekst` op `regel` en verstuurt alleen de cellen die afwijken van wat er al staat."""
+        self.toon_codes(regel, self.codeer(tekst[:self.breedte]))
+
+    def toon_codes(self, regel, codes):
+        """Als toon(), maar met tekencodes die al gecodeerd zijn (bijvoorbeeld een scrollframe)."""
+        codes = list(codes[:self.breedte]) + [0x20] * (self.breedte - len(codes))
+        with self.lock:
+            huidig = self.scherm[regel]
+            for kolom, code in enumerate(codes):
+                if huidig[kolom] == code:
+                    continue
+                if self.cursor != (regel, kolom):
+                    # Eén ongewijzigde cel overschrijven kost evenveel als een adrescommando
+                    vorige = self.cursor[1] if self.cursor and self.cursor[0] == regel else None
+                    if vorige is not None and kolom - vorige == 1:
+                        self._nibbles(huidig[vorige], LCD_CHR)
+                    else:
+                        self.commando(LCD_LINES[regel] + kolom)
+                self._nibbles(code, LCD_CHR)
+                huidig[kolom] = code
+                self.cursor = (regel, kolom + 1)
+            self.flush()
+
+    def scrollframes(self, tekst):
+        """Codeert `tekst` één keer en knipt hem in frames van één schermbreedte.
+
+        De gebruikte CGRAM-slots blijven vastgezet tot vrijgeven(), zodat de frames geldig blijven.
+        """
+        with self.lock:
+            codes = self.codeer(tekst)
+            self.vastgezet |= {code for code in codes if code < 8}
+        if len(codes) <= self.breedte:
+            return [codes]
+        return [codes[i:i + self.breedte] for i in range(len(codes) - self.breedte + 1)]
+
+    def vrijgeven(self):
+        with self.lock:
+            self.vastgezet = set()
+
+    def wis(self):
+        self.commando(0x01)
+
+lcd = LCD(bus)
+lcd_melding = None  # (tekst, tot): tijdelijke melding op de tweede regel van de klok
+
+def init_lcd():
+    """Opent de I2C-bus en initialiseert het display; de eerste opstartstap."""
+    global bus
+    if bus is None:
+        bus = smbus.SMBus(1)
+        lcd.bus = bus
+    lcd.init()
+    return lcd
+
 def lcd_init():
-    commands = [0x33, 0x32, 0x06, 0x0C, 0x28, 0x01]
-    for cmd in commands:
-        lcd_byte(cmd, LCD_CMD)
-        time.sleep(E_DELAY)
+    lcd.init()
 
 def lcd_byte(data, mode):
-    high = mode | (data & 0xF0) | LCD_BACKLIGHT
-    low = mode | ((data << 4) & 0xF0) | LCD_BACKLIGHT
-    for byte in [high, low]:
-        bus.write_byte(I2C_ADDR, byte)
-        lcd_toggle_enable(byte)
-
-def lcd_toggle_enable(data):
-    time.sleep(E_DELAY)
-    bus.write_byte(I2C_ADDR, data | ENABLE)
-    time.sleep(E_PULSE)
-    bus.write_byte(I2C_ADDR, data & ~ENABLE)
-    time.sleep(E_DELAY)
+    lcd.schrijf_byte(data, mode)
 
 def lcd_display(lines):
     for i, text in enumerate(lines[:len(LCD_LINES)]):
-        lcd_byte(LCD_LINES[i], LCD_CMD)
-        for char in text.ljust(LCD_WIDTH):
-            lcd_byte(ord(char), LCD_CHR)
-
-def lcd_scroll_text(line, text, delay=1, pause=2):
-    lcd_byte(LCD_LINES[line], LCD_CMD)
-    text = text.ljust(LCD_WIDTH)
-    lcd_display_line(line, text)
-    time.sleep(pause)
-    for i in range(len(text) - LCD_WIDTH + 1):
-        segment = text[i:i + LCD_WIDTH]
-        lcd_display_line(line, segment)
-        time.sleep(delay)
+        lcd.toon(i, text)
+
+async def lcd_async(functie, *args):
+    """Voert een LCD-functie uit in de I2C-thread, zodat de event loop niet op de bus wacht."""
+    return await asyncio.get_running_loop().run_in_executor(lcd_executor, functie, *args)
+
+async def lcd_scroll(line, frames, actief):
+    """Speelt vooraf berekende frames af; vóór elk frame wordt `actief()` gecontroleerd.
+
+    Per stap gaan alleen de verschoven cellen over de bus. Geeft False terug als er afgebroken is.
+    """
+    for i, frame in enumerate(frames):
+        if not actief():
+            return False
+        await lcd_async(lcd.toon_codes, line, frame)
+        await asyncio.sleep(LCD_SCROLL_PAUZE if i in (0, len(frames) - 1) else LCD_SCROLL_STAP)
+    return True
 
 def lcd_display_line(line, text):
-    lcd_byte(LCD_LINES[line], LCD_CMD)
-    for char in text.ljust(LCD_WIDTH):
-        lcd_byte(ord(char), LCD_CHR)
+    lcd.toon(line, text)
 
 def lcd_clear():
-    lcd_byte(0x01, LCD_CMD)
+    lcd.wis()
 
 # Database-functies
-def haal_herinneringen_op(huidige_datum, huidige_tijd):
-    c.execute("SELECT beschrijving FROM herinneringen WHERE datum=? AND tijd=?", (huidige_datum, huidige_tijd))
-    return c.fetchall()
-
-def verplaats_herinnering_naar_verlopen(beschrijving, datum, tijd):
-    conn_verlopen = sqlite3.connect('verlopen_herinneringen.db')
-    c_verlopen = conn_verlopen.cursor()
-
-    c_verlopen.execute('''CREATE TABLE IF NOT EXISTS verlopen_herinneringen (
-        beschrijving TEXT, datum TEXT, tijd TEXT)''')
-    conn_verlopen.commit()
+class HerinneringPlanner:
+    """Min-heap van komende herinneringen op tijdstip; de database wordt alleen bij de start gelezen."""
+
+    def __init__(self):
+        self.heap = []  # (tijdstip, id, beschrijving, datum, tijd)
+        self.lock = threading.Lock()  # voeg_herinnering_toe en de hoofdloop gebruiken de heap samen
+        self.loop = None
+        self.gewijzigd = None  # asyncio.Event: wekt de plannertaak bij een nieuwe of afgeronde herinnering
+
+    def koppel(self, loop):
+        self.loop = loop
+        self.gewijzigd = asyncio.Event()
+
+    def wek(self):
+        """Laat de plannertaak opnieuw kijken; veilig vanuit elke thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.gewijzigd.set)
+
+    def laad(self):
+        """Vult de heap met alle herinneringen uit de database."""
+        for herinnering in opslag.alle():
+            self.voeg_toe(*herinnering)
+        print(f"📅 {len(self.heap)} herinneringen gepland.")
+
+    def voeg_toe(self, herinnering_id, beschrijving, datum, tijd):
+        try:
+            tijdstip = datetime.strptime(f"{datum} {tijd}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            print(f"⚠️ Ongeldige datum/tijd voor herinnering '{beschrijving}': {datum} {tijd}")
+            return
+        with self.lock:
+            heapq.heappush(self.heap, (tijdstip, herinnering_id, beschrijving, datum, tijd))
+        self.wek()
+
+    def wachttijd(self, nu=None):
+        """Seconden tot de volgende herinnering (0 als er een klaarstaat), of None als de heap leeg is."""
+        nu = nu or datetime.now()
+        with self.lock:
+            if not self.heap:
+                return None
+            return max((self.heap[0][0] - nu).total_seconds(), 0.0)
+
+    def volgende_verschuldigd(self, nu=None):
+        """Haalt de oudste herinnering die nu (of eerder, dus gemist) af moest gaan van de heap."""
+        nu = nu or datetime.now()
+        with self.lock:
+            if self.heap and self.heap[0][0] <= nu:
+                return heapq.heappop(self.heap)
+        return None
 
-    c_verlopen.execute("INSERT INTO verlopen_herinneringen (beschrijving, datum, tijd) VALUES (?, ?, ?)",
-                       (beschrijving, datum, tijd))
+planner = HerinneringPlanner()
 
-    conn_verlopen.commit()
-    conn_verlopen.close()
+def verplaats_herinnering_naar_verlopen(uitkomst):
+    """Zet de actieve herinnering met haar uitkomst in de archiefbuffer (weggeschreven door archief_lus)."""
+    global actieve_afloop
+    afloop, actieve_afloop = actieve_afloop, None
+    if afloop is None:
+        return
+    nu = time.time()
+    reactie = afloop["reactie"] or (None if uitkomst == "verlopen" else nu)
+    opslag.archiveer_later(afloop["beschrijving"], afloop["datum"], afloop["tijd"], afloop["afgegaan"], nu,
+                           uitkomst, reactie - afloop["afgegaan"] if reactie else None)
 
 # Buzzer- en lampje-functies
-def start_buzzer_en_lampje():
+async def start_buzzer_en_lampje():
     global buzzer_actief, lampje_actief
     buzzer_actief = True
     lampje_actief = True
-    while buzzer_actief and lampje_actief:
-        GPIO.output(BUZZER_PIN, GPIO.HIGH)
-        GPIO.output(LAMPJE_PIN, GPIO.HIGH)
-        time.sleep(0.2)
+    try:
+        while buzzer_actief and lampje_actief:
+            GPIO.output(BUZZER_PIN, GPIO.HIGH)
+            GPIO.output(LAMPJE_PIN, GPIO.HIGH)
+            await asyncio.sleep(0.2)
+            GPIO.output(BUZZER_PIN, GPIO.LOW)
+            GPIO.output(LAMPJE_PIN, GPIO.LOW)
+            await asyncio.sleep(0.2)
+    finally:
         GPIO.output(BUZZER_PIN, GPIO.LOW)
         GPIO.output(LAMPJE_PIN, GPIO.LOW)
-        time.sleep(0.2)
 
 def stop_buzzer_en_lampje():
     global buzzer_actief, lampje_actief
@@ -303,201 +2578,630 @@ def stop_buzzer_en_lampje():
     GPIO.output(BUZZER_PIN, GPIO.LOW)
     GPIO.output(LAMPJE_PIN, GPIO.LOW)
 
-def korte_buzz():
+async def korte_buzz():
     GPIO.output(BUZZER_PIN, GPIO.HIGH)
-    time.sleep(0.1)
+    await asyncio.sleep(0.1)
     GPIO.output(BUZZER_PIN, GPIO.LOW)
 
-# BLE-functies
-async def control_led(action):
-    global ble_client
-    try:
-        if ble_client is None or not ble_client.is_connected:
-            ble_client = BleakClient(XIAO_MAC_ADDRESS)
-            await ble_client.connect()
-            print("Verbonden met XIAO")
-
-        if action == "blink":
-            await ble_client.write_gatt_char(RX_CHARACTERISTIC_UUID, b'2')
-            print("XIAO LED KNIPPEREN")
-        elif action == "off":
-            await ble_client.write_gatt_char(RX_CHARACTERISTIC_UUID, b'0')
-            print("XIAO LED UIT")
-            # Verbreek de verbinding na het uitschakelen van de LED
-            await ble_client.disconnect()
-            ble_client = None
-            print("BLE-verbinding gesloten")
-    except Exception as e:
-        print(f"BLE Fout: {e}")
+# Knop-functies
+def start_knop_interrupts(loop):
+    """Zet elke flank van de knop via een GPIO-interrupt met tijdstempel in een asyncio-queue."""
+    global knop_flanken, knop_acties
+    knop_flanken = asyncio.Queue()
+    knop_acties = asyncio.Queue()
+
+    def flank(kanaal):
+        # Draait in de GPIO-thread: tijdstip en audiopositie meteen vastleggen, dan naar de event loop
+        ingedrukt = GPIO.input(KNOP_PIN) == GPIO.LOW
+        audio_positie = audio_ring.positie() if audio_ring is not None else None
+        loop.call_soon_threadsafe(knop_flanken.put_nowait, (time.monotonic(), ingedrukt, audio_positie))
+
+    GPIO.add_event_detect(KNOP_PIN, GPIO.BOTH, callback=flank, bouncetime=KNOP_DEBOUNCE_MS)
+
+async def _wacht_op_flank(ingedrukt, timeout=None):
+    """Wacht op een flank naar `ingedrukt`; geeft (tijdstip, audiopositie) terug, of None na `timeout`."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        rest = None if deadline is None else deadline - time.monotonic()
+        if rest is not None and rest <= 0:
+            return None
+        try:
+            tijdstip, staat, audio_positie = await asyncio.wait_for(knop_flanken.get(), rest)
+        except asyncio.TimeoutError:
+            return None
+        if staat == ingedrukt:
+            return tijdstip, audio_positie
+
+async def herken_knop_patronen():
+    """Toestandsmachine die flanken omzet in enkele, dubbele en lange drukken.
+
+    Zonder actieve herinnering bestaat er geen dubbelklik, dus dan wordt een enkele druk direct
+    bij het loslaten doorgegeven in plaats van na DUBBELKLIK_TIJD.
+    """
+    while True:
+        _, audio_positie = await _wacht_op_flank(True)
+        if await _wacht_op_flank(False, LANG_INDRUKKEN) is None:
+            patroon = "lang"
+        elif not herinnering_actief or await _wacht_op_flank(True, DUBBELKLIK_TIJD) is None:
+            patroon = "enkel"
+        else:
+            patroon = "dubbel"
+        print(f"Knop: {patroon}")
+        knop_acties.put_nowait((patroon, audio_positie))
 
-async def main():
-    global stop_flag, herinnering_actief, knop_ingedrukt_count, ble_client
-    lcd_init()
+def snooze_herinnering(beschrijving):
+    moment = datetime.now() + timedelta(minutes=SNOOZE_MINUTEN)
+    voeg_herinnering_toe(beschrijving, moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M"))
 
-    # Start Deepseek proces aan het begin van de loop
-    deepseek_process = run_deepseek()
-    if not deepseek_process:
-        return
+# BLE-functies
+def maak_ble_commando(seq, patroon, aan_ms=0, uit_ms=0, herhalingen=0, timeout_s=0):
+    """Bouwt een commandoframe (versie 1) voor de XIAO.
 
-    vorige_tijd = ""
-    laatste_opruiming = time.time()
-
-    while not stop_flag:
-        # Controleer knop
-        if GPIO.input(KNOP_PIN) == GPIO.LOW:  # Knop is ingedrukt
-            print("Knop ingedrukt!")
-            knop_ingedrukt_count += 1
-
-            # Eerste klik: stop buzzer, lampje en XIAO LED, maar blijf herinnering tonen
-            if knop_ingedrukt_count == 1 and herinnering_actief:
-                stop_buzzer_en_lampje()
-                korte_buzz()  # Korte buzz na eerste druk
-                # Zet de LED van XIAO uit
-                await control_led("off")
-                print("Buzzer en LED gestopt, herinnering blijft tonen.")
-                time.sleep(0.5)  # Voorkom dubbele knopdrukken door debounce
-
-            # Tweede klik: stop herinnering en keer terug naar klokfunctie
-            elif knop_ingedrukt_count == 2 and herinnering_actief:
-                stop_buzzer_en_lampje()
-                korte_buzz()  # Korte buzz na tweede druk
-                herinnering_actief = False
-                lcd_clear()  # LCD leegmaken voordat de klokmodus wordt weergegeven
-                lcd_display([f"Tijd: {datetime.now().strftime('%H:%M')}", f"Datum: {datetime.now().strftime('%Y-%m-%d')}"])
-                knop_ingedrukt_count = 0  # Reset knopdrukken
-                print("Herinnering gestopt, terug naar klok.")
-                time.sleep(0.5)  # Voorkom dubbele knopdrukken door debounce
-
-            # Als de knop wordt ingedrukt zonder actieve herinnering, start spraakopname
-            elif not herinnering_actief:
-                print("🎤 Knop ingedrukt! Start met praten")
-                buzzer_beep()  # 🔊 Buzzer piept vóór de opname
-                start_time = time.time()  # Tijd bijhouden voor performance
-
-                text = capture_speech()
-                if not text:
+    Indeling, little-endian: versie, seq, patroon, aan_ms (u16), uit_ms (u16), herhalingen
+    (0 = onbeperkt), timeout_s (u16, 0 = geen), XOR-checksum van de voorgaande bytes.
+    Aangevuld tot de 20 bytes van de RX-karakteristiek.
+    """
+    frame = struct.pack("<BBBHHBH", BLE_PROTOCOL_VERSIE, seq & 0xFF, patroon, aan_ms, uit_ms, herhalingen, timeout_s)
+    checksum = 0
+    for byte in frame:
+        checksum ^= byte
+    return (frame + bytes([checksum])).ljust(20, b"\0")
+
+class BLEApparaat:
+    """Eén XIAO: houdt de verbinding open en verstuurt writes één voor één via een eigen queue."""
+
+    def __init__(self, adres):
+        self.adres = adres
+        self.client = None
+        self.wachtrij = asyncio.Queue()
+        self.verbonden = asyncio.Event()
+        self.verbroken = asyncio.Event()
+        self.taken = []
+        self.verbindtijden = deque(maxlen=50)  # Seconden per geslaagde verbinding
+        self.schrijftijden = deque(maxlen=50)  # Seconden per geslaagde write
+        self.rondreistijden = deque(maxlen=50)  # Seconden van write tot ack
+        self.herverbindingen = 0
+        self.acks = {}  # seq -> future die de ack afwacht
+        self.probe = None  # Future van een lopende versieprobe
+        self.oude_firmware = True  # Tot de probe slaagt: '2'/'0' met write-with-response, zonder acks
+
+    def _bij_notificatie(self, afzender, data):
+        if len(data) < 5 or data[0] != BLE_PROTOCOL_VERSIE:
+            return
+        soort, seq, status, patroon = data[1], data[2], data[3], data[4]
+        if soort == BERICHT_ACK and self.probe is not None:
+            if not self.probe.done():
+                self.probe.set_result(True)  # Elk antwoord bewijst dat de firmware het binaire protocol kent
+            return
+        if soort == BERICHT_ACK:
+            resultaat = self.acks.pop(seq, None)
+            if resultaat is not None and not resultaat.done():
+                resultaat.set_result(status == BLE_STATUS_OK)
+            if status != BLE_STATUS_OK:
+                print(f"XIAO {self.adres} weigerde commando {seq} (status {status})")
+        elif soort == BERICHT_STATUS:
+            # De XIAO stopte het patroon zelf (herhalingen op of timeout verlopen)
+            print(f"XIAO {self.adres}: patroon van commando {seq} afgelopen, nu patroon {patroon}")
+
+    def start(self):
+        self.taken = [asyncio.create_task(self._verbind_lus()), asyncio.create_task(self._schrijf_lus())]
+
+    def _bij_verbreken(self, client):
+        self.verbonden.clear()
+        self.verbroken.set()
+
+    async def _verbind_lus(self):
+        """Verbindt, en herverbindt met exponentiële backoff zodra de link wegvalt."""
+        backoff = BLE_BACKOFF_START
+        while True:
+            if self.client is None or not self.client.is_connected:
+                self.verbonden.clear()
+                try:
+                    begin = time.perf_counter()
+                    self.client = BleakClient(self.adres, disconnected_callback=self._bij_verbreken)
+                    await self.client.connect()
+                    self.verbindtijden.append(time.perf_counter() - begin)
+                    metrics.meet("ble_verbinden", self.verbindtijden[-1], adres=self.adres)
+                    # Ook de oorspronkelijke firmware heeft een TX-karakteristiek met notify, dus alleen
+                    # een antwoord op de versieprobe zegt of de XIAO het binaire protocol kent
+                    try:
+                        await self.client.start_notify(TX_CHARACTERISTIC_UUID, self._bij_notificatie)
+                        self.oude_firmware = not await self._probeer_versie()
+                    except Exception as e:
+                        print(f"Geen notificaties van XIAO {self.adres}: {e}")
+                        self.oude_firmware = True
+                    if self.oude_firmware:
+                        print(f"XIAO {self.adres} antwoordt niet op de versieprobe, oude firmware: '2'/'0' zonder acks")
+                    print(f"Verbonden met XIAO {self.adres} in {self.verbindtijden[-1]:.2f} s")
+                    self.verbroken.clear()
+                    self.verbonden.set()
+                    backoff = BLE_BACKOFF_START
+                except Exception as e:
+                    self.herverbindingen += 1
+                    metrics.tel("ble_herverbindingen")
+                    print(f"BLE Fout ({self.adres}): {e}, nieuwe poging over {backoff:.0f} s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, BLE_BACKOFF_MAX)
                     continue
+            # Keepalive: wakker bij een verbroken link, anders periodiek controleren
+            try:
+                await asyncio.wait_for(self.verbroken.wait(), BLE_KEEPALIVE)
+                self.herverbindingen += 1
+                metrics.tel("ble_herverbindingen")
+                print(f"BLE-verbinding met {self.adres} verbroken, herverbinden...")
+            except asyncio.TimeoutError:
+                pass
+
+    async def _probeer_versie(self):
+        """Stuurt BLE_VERSIE_PROBE; True als de XIAO binnen BLE_ACK_TIMEOUT met een ack antwoordt."""
+        self.probe = asyncio.get_running_loop().create_future()
+        try:
+            await self.client.write_gatt_char(RX_CHARACTERISTIC_UUID, BLE_VERSIE_PROBE, response=False)
+            return await asyncio.wait_for(self.probe, BLE_ACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.probe = None
+
+    async def _schrijf_lus(self):
+        """Voert de writes voor dit apparaat strikt na elkaar uit."""
+        while True:
+            data, oud, seq, resultaat = await self.wachtrij.get()
+            try:
+                await asyncio.wait_for(self.verbonden.wait(), BLE_WRITE_TIMEOUT)
+                begin = time.perf_counter()
+                if not self.oude_firmware:
+                    # De ack bevestigt de levering, dus een write zonder response volstaat
+                    ack = asyncio.get_running_loop().create_future()
+                    self.acks[seq] = ack
+                    await self.client.write_gatt_char(RX_CHARACTERISTIC_UUID, data, response=False)
+                    self.schrijftijden.append(time.perf_counter() - begin)
+                    geslaagd = await asyncio.wait_for(ack, BLE_ACK_TIMEOUT)
+                    self.rondreistijden.append(time.perf_counter() - begin)
+                else:
+                    # Oude firmware kijkt alleen naar het eerste teken: '2' knipperen, '0' uit
+                    await self.client.write_gatt_char(RX_CHARACTERISTIC_UUID, oud, response=True)
+                    self.schrijftijden.append(time.perf_counter() - begin)
+                    geslaagd = True
+                resultaat.set_result(geslaagd)
+            except Exception as e:
+                self.acks.pop(seq, None)
+                print(f"BLE Fout bij schrijven naar {self.adres}: {e!r}")
+                resultaat.set_result(False)
+
+    async def schrijf(self, data, oud, seq):
+        """Zet een commando in de wachtrij: `data` voor nieuwe firmware, `oud` ('2'/'0') voor oude."""
+        resultaat = asyncio.get_running_loop().create_future()
+        self.wachtrij.put_nowait((data, oud, seq, resultaat))
+        return await resultaat
+
+    async def stop(self):
+        for taak in self.taken:
+            taak.cancel()
+        await asyncio.gather(*self.taken, return_exceptions=True)
+        if self.client is not None and self.client.is_connected:
+            await self.client.disconnect()
+
+class BLEBeheer:
+    """Houdt verbindingen met alle XIAO-klokken open en stuurt commando's gelijktijdig naar allemaal."""
+
+    def __init__(self, adressen=XIAO_MAC_ADRESSEN):
+        self.apparaten = [BLEApparaat(adres) for adres in adressen]
+        self.seq = 0
+
+    def start(self):
+        for apparaat in self.apparaten:
+            apparaat.start()
+
+    async def zend(self, patroon, aan_ms=0, uit_ms=0, herhalingen=0, timeout_s=0):
+        """Stuurt één commandoframe naar alle klokken tegelijk; geeft per apparaat True/False terug."""
+        self.seq = (self.seq + 1) & 0xFF
+        data = maak_ble_commando(self.seq, patroon, aan_ms, uit_ms, herhalingen, timeout_s)
+        oud = b"0" if patroon == PATROON_UIT else b"2"
+        return await asyncio.gather(*(apparaat.schrijf(data, oud, self.seq) for apparaat in self.apparaten))
+
+    def statistieken(self):
+        """Gemiddelde en maximale verbind- en schrijflatentie (ms) per apparaat."""
+        def samenvatting(tijden):
+            if not tijden:
+                return None
+            return {"gem_ms": 1000 * sum(tijden) / len(tijden), "max_ms": 1000 * max(tijden)}
+        return {
+            apparaat.adres: {
+                "verbinden": samenvatting(apparaat.verbindtijden),
+                "schrijven": samenvatting(apparaat.schrijftijden),
+                "rondreis": samenvatting(apparaat.rondreistijden),
+                "herverbindingen": apparaat.herverbindingen,
+            }
+            for apparaat in self.apparaten
+        }
+
+    async def stop(self):
+        await asyncio.gather(*(apparaat.stop() for apparaat in self.apparaten))
+        print("BLE-verbindingen gesloten")
 
-                print("🎬 Opname voltooid! Start Deepseek...")
-                buzzer_beep()  # 🔊 Buzzer piept na de opname
-
-                # Verstuur de tekst naar Deepseek
-                ai_resultaat = send_to_deepseek(deepseek_process, text)
-                if ai_resultaat:
-                    beschrijving, datum, tijd = ai_resultaat
-                    if voeg_herinnering_toe(beschrijving, datum, tijd):
-                        end_time = time.time()
-                        print(f"✅ Proces voltooid in {end_time - start_time:.2f} seconden.")
-                        continue
-
-                print("❌ Probeer opnieuw met dezelfde tekst.")
-
-        huidige_datum = datetime.now().strftime("%Y-%m-%d")
-        huidige_tijd = datetime.now().strftime("%H:%M")
-
-        # Opruimen verlopen herinneringen (elke minuut)
-        if time.time() - laatste_opruiming > 60:
-            verplaats_verlopen_herinneringen()
-            laatste_opruiming = time.time()
-
-        herinneringen = haal_herinneringen_op(huidige_datum, huidige_tijd)
-
-        if herinneringen and not herinnering_actief:
-            herinnering_actief = True  # Markeer dat een herinnering bezig is
-            beschrijving = herinneringen[0][0]  # Eerste herinnering tonen
-            start_tijd = time.time()  # Starttijd van de herinnering
-
-            print(f"Herinnering: {beschrijving}")
-            lcd_clear()  # LCD leegmaken voordat de herinnering wordt weergegeven
-            lcd_display(["Herinnering:", ""])
-            time.sleep(1)
-
-            # Verplaats de herinnering naar de verlopen tabel
-            verplaats_herinnering_naar_verlopen(beschrijving, huidige_datum, huidige_tijd)
-            # Verwijder de herinnering uit de actieve tabel
-            c.execute("DELETE FROM herinneringen WHERE beschrijving = ? AND datum = ? AND tijd = ?",
-                      (beschrijving, huidige_datum, huidige_tijd))
-            conn.commit()
+async def control_led(action):
+    begin = time.perf_counter()
+    if action == "blink":
+        # De XIAO stopt zelf na HERINNERING_DUUR, ook als het 'uit'-commando verloren gaat
+        resultaten = await ble_beheer.zend(PATROON_KNIPPER, 500, 500, 0, HERINNERING_DUUR)
+    else:
+        resultaten = await ble_beheer.zend(PATROON_UIT)
+    duur = time.perf_counter() - begin
+    metrics.meet("ble_commando", duur, actie=action)
+    metrics.tel("ble_mislukt", len(resultaten) - sum(resultaten))
+    status = "KNIPPEREN" if action == "blink" else "UIT"
+    print(f"XIAO LED {status} ({sum(resultaten)}/{len(resultaten)} klokken, {1000 * duur:.0f} ms)")
+
+# Taken van de asyncio-runtime
+def achtergrond(coro):
+    """Start een taak zonder op het resultaat te wachten."""
+    taak = asyncio.create_task(coro)
+    achtergrond_taken.add(taak)
+    taak.add_done_callback(achtergrond_taken.discard)
+    return taak
+
+async def klok_lus():
+    """Ververst de klok elke seconde; de framebuffer verstuurt alleen wat echt verandert."""
+    while True:
+        if not herinnering_actief:
+            nu = datetime.now()
+            tweede_regel = f"Datum:{nu.strftime('%Y-%m-%d')}"
+            if lcd_melding is not None and time.time() < lcd_melding[1]:
+                tweede_regel = lcd_melding[0]
+            await lcd_async(lcd_display, [f"Tijd:{nu.strftime('%H:%M')}", tweede_regel])
+        await asyncio.sleep(1 - time.time() % 1)  # Wakker worden op de secondegrens
+
+async def toon_melding(tekst, duur=2.0):
+    """Toont `tekst` een paar seconden op de tweede regel, in plaats van de datum."""
+    global lcd_melding
+    lcd_melding = (tekst, time.time() + duur)
+    if not herinnering_actief:
+        await lcd_async(lcd_display_line, 1, tekst)
+
+async def archief_lus():
+    """Schrijft het archief gebundeld weg (één transactie per interval) en doet dagelijks onderhoud."""
+    await opstart.wacht("opslag")
+    loop = asyncio.get_running_loop()
+    volgend_onderhoud = time.time() + ARCHIEF_ONDERHOUD_INTERVAL  # Het eerste onderhoud was bij de start
+    while True:
+        await asyncio.sleep(ARCHIEF_SCHRIJF_INTERVAL)
+        await loop.run_in_executor(None, opslag.schrijf_archief)
+        if time.time() >= volgend_onderhoud:
+            opruimen = await loop.run_in_executor(None, opslag.onderhoud)
+            if opruimen:
+                print(f"🗄 {opruimen} oude archiefrijen opgeruimd.")
+            volgend_onderhoud = time.time() + ARCHIEF_ONDERHOUD_INTERVAL
+
+async def planner_lus():
+    """Slaapt tot de volgende herinnering (of een wijziging in de planning) en laat hem afgaan."""
+    await opstart.wacht("opslag")
+    while True:
+        planner.gewijzigd.clear()
+        if not herinnering_actief:
+            herinnering = planner.volgende_verschuldigd()
+            if herinnering:
+                await start_herinnering(herinnering)
+                continue
+        wachttijd = None if herinnering_actief else planner.wachttijd()
+        if wachttijd is not None:
+            wachttijd = min(wachttijd, PLANNER_MAX_WACHT)
+        try:
+            await asyncio.wait_for(planner.gewijzigd.wait(), wachttijd)
+        except asyncio.TimeoutError:
+            pass
+
+async def start_herinnering(herinnering):
+    global herinnering_actief, actieve_herinnering, actieve_afloop, knop_ingedrukt_count, alarm_taak, weergave_taak
+    tijdstip, herinnering_id, beschrijving, datum, tijd = herinnering
+    herinnering_actief = True  # Markeer dat een herinnering bezig is
+    actieve_herinnering = beschrijving
+    knop_ingedrukt_count = 0
+    start_tijd = time.time()  # Starttijd van de herinnering
+    # Vóór de eerste await: een knopdruk tijdens het opstarten van de herinnering heeft dit al nodig
+    actieve_afloop = {"beschrijving": beschrijving, "datum": datum, "tijd": tijd,
+                      "afgegaan": start_tijd, "reactie": None}
+
+    vertraging = datetime.now() - tijdstip
+    metrics.meet("herinnering_vertraging", max(vertraging.total_seconds(), 0.0))
+    if vertraging > timedelta(minutes=1):
+        print(f"⏰ Gemiste herinnering van {datum} {tijd} wordt alsnog getoond.")
+        metrics.tel("herinneringen_gemist")
+    print(f"Herinnering: {beschrijving}")
+    await lcd_async(lcd_clear)  # LCD leegmaken voordat de herinnering wordt weergegeven
+    await lcd_async(lcd_display, ["🔔 Herinnering:", ""])
+
+    # Haal de herinnering (op id) uit de planning; het archief volgt zodra ze afgehandeld is
+    await asyncio.get_running_loop().run_in_executor(None, opslag.verwijder, herinnering_id)
+    if not herinnering_actief:
+        return  # Al weggedrukt terwijl het LCD en de database bezig waren
+
+    # Piepen, lampje, BLE LED en weergave lopen als losse taken naast de knop en de klok
+    alarm_taak = asyncio.create_task(start_buzzer_en_lampje())
+    achtergrond(control_led("blink"))
+    weergave_taak = asyncio.create_task(toon_herinnering(beschrijving, start_tijd))
+
+async def beeindig_herinnering(snooze=False):
+    """Stopt de actieve herinnering na een knopdruk en keert terug naar de klok."""
+    global herinnering_actief, knop_ingedrukt_count
+    stop_buzzer_en_lampje()
+    if weergave_taak is not None:
+        weergave_taak.cancel()
+    await korte_buzz()
+    if knop_ingedrukt_count == 0:
+        achtergrond(control_led("off"))
+    if snooze:
+        await asyncio.get_running_loop().run_in_executor(None, snooze_herinnering, actieve_herinnering)
+        print(f"💤 Herinnering {SNOOZE_MINUTEN} minuten uitgesteld.")
+    verplaats_herinnering_naar_verlopen("gesnoozed" if snooze else "afgewezen")
+    herinnering_actief = False
+    knop_ingedrukt_count = 0  # Reset knopdrukken
+    await lcd_async(lcd_clear)  # LCD leegmaken voordat de klokmodus wordt weergegeven
+    planner.wek()
+    print("Herinnering gestopt, terug naar klok.")
 
-            # Start piepen, lampje en BLE LED in aparte thread
-            buzzer_lampje_thread = threading.Thread(target=start_buzzer_en_lampje)
-            buzzer_lampje_thread.start()
+async def toon_herinnering(beschrijving, start_tijd):
+    global herinnering_actief
+    def actief():
+        return herinnering_actief and time.time() - start_tijd < HERINNERING_DUUR
 
-            # Start BLE LED knipperen
-            await control_led("blink")
+    # Frames één keer berekenen; een knopdruk breekt de scroll tussen twee frames af
+    frames = await lcd_async(lcd.scrollframes, beschrijving)
+    try:
+        while await lcd_scroll(1, frames, actief):
+            pass
+    finally:
+        lcd.vrijgeven()
 
-            # Herinnering tonen in aparte thread om de knopcontrole niet te blokkeren
-            herinnering_thread = threading.Thread(target=toon_herinnering, args=(beschrijving, start_tijd))
-            herinnering_thread.start()
+    # Stop de herinnering na 2 minuten; met een eerdere knopdruk telt ze als afgewezen
+    verplaats_herinnering_naar_verlopen("afgewezen" if actieve_afloop["reactie"] else "verlopen")
+    herinnering_actief = False
+    stop_buzzer_en_lampje()
+    await control_led("off")
+    await lcd_async(lcd_clear)
+    await lcd_async(lcd_display, ["Herinnering", "gestopt"])
+    await asyncio.sleep(0.5)
+    planner.wek()
+
+async def spraak_naar_herinnering(audio_positie, sessie):
+    """Opname, herkenning en extractie; het zware werk draait in executors."""
+    loop = asyncio.get_running_loop()
+    print("🎤 Knop ingedrukt! Start met praten")
+    piep = await buzzer_beep()  # 🔊 Buzzer piept vóór de opname
+    start_time = time.time()  # Tijd bijhouden voor performance
+
+    # Opname telt vanaf het moment van de knopdruk (uit de interrupt), niet na de piep;
+    # de piep zelf valt dus in het venster en wordt overgeslagen
+    if pijplijn is not None:
+        with metrics.span("opname_stt"):
+            herkenning = await pijplijn.herken(audio_positie, piep=piep)
+        text = meld_herkenning(herkenning)
+    else:
+        text = await loop.run_in_executor(audio_executor, capture_speech, audio_positie, piep)
+    if not text:
+        return
 
+    print("🎬 Opname voltooid! Start Deepseek...")
+    await buzzer_beep()  # 🔊 Buzzer piept na de opname
+
+    # Lokale regels eerst, anders de tekst naar Deepseek
+    ai_resultaat = await loop.run_in_executor(None, extraheer_herinnering, sessie, text)
+    if ai_resultaat:
+        if await loop.run_in_executor(None, voeg_herinnering_toe, *ai_resultaat):
+            end_time = time.time()
+            metrics.meet("spraak_naar_herinnering", end_time - start_time)
+            print(f"✅ Proces voltooid in {end_time - start_time:.2f} seconden.")
+            return
+
+    print("❌ Probeer opnieuw met dezelfde tekst.")
+
+async def verwerk_knop(patroon, audio_positie):
+    global knop_ingedrukt_count, spraak_taak
+    if herinnering_actief:
+        # Eerste enkele druk: stop buzzer, lampje en XIAO LED, maar blijf herinnering tonen
+        if patroon == "enkel" and knop_ingedrukt_count == 0:
+            knop_ingedrukt_count = 1
+            actieve_afloop["reactie"] = time.time()
+            stop_buzzer_en_lampje()
+            await korte_buzz()  # Korte buzz na eerste druk
+            # Zet de LED van XIAO uit (op de achtergrond, zodat een offline klok de knop niet ophoudt)
+            achtergrond(control_led("off"))
+            print("Buzzer en LED gestopt, herinnering blijft tonen.")
+        # Tweede druk, dubbelklik of lang indrukken (snooze): stop herinnering en keer terug naar klok
         else:
-            if huidige_tijd != vorige_tijd:  # Alleen updaten als de tijd verandert
-                lcd_display([f"Tijd:{huidige_tijd}", f"Datum:{huidige_datum}"])
-                vorige_tijd = huidige_tijd
-
-            time.sleep(1)
+            await beeindig_herinnering(snooze=patroon == "lang")
+
+    # Zolang de microfoon of Vosk nog laadt, kan er niets opgenomen worden
+    elif patroon == "enkel" and not opstart.klaar("audio", "vosk"):
+        print("⏳ Spraakherkenning wordt nog geladen.")
+        await toon_melding("Laden...")
+
+    # Zonder database kan een herinnering niet opgezocht (cache) of opgeslagen worden
+    elif patroon == "enkel" and not opstart.klaar("opslag"):
+        mislukt = opstart.tijden.get("opslag", {}).get("mislukt")
+        print("❌ Database niet beschikbaar." if mislukt else "⏳ Database wordt nog geopend.")
+        await toon_melding("Geen database" if mislukt else "Laden...")
+
+    # Als de knop wordt ingedrukt zonder actieve herinnering, start spraakopname
+    elif patroon == "enkel":
+        if pijplijn is not None:
+            # Een tweede uiting mag opgenomen worden terwijl de eerste nog verwerkt wordt, maar niet meer
+            if pijplijn.vol():
+                print("⏳ Er worden al genoeg opnames verwerkt.")
+                await toon_melding("Even wachten...")
+                return
+            pijplijn.start_uiting(spraak_naar_herinnering(audio_positie, deepseek_sessie))
+            return
+        if spraak_taak is not None and not spraak_taak.done():
+            print("⏳ Vorige opname wordt nog verwerkt.")
+            return
+        spraak_taak = asyncio.create_task(spraak_naar_herinnering(audio_positie, deepseek_sessie))
+
+async def knop_lus():
+    while True:
+        patroon, audio_positie = await knop_acties.get()
+        try:
+            await verwerk_knop(patroon, audio_positie)
+        except Exception as e:
+            # Eén mislukte knopdruk mag de knop niet uitschakelen tot een herstart
+            print(f"❌ Fout bij verwerken van knopdruk '{patroon}': {e!r}")
+
+# Gefaseerde opstart: eerst de klok, daarna de zware subsystemen tegelijk op de achtergrond
+class Opstart:
+    """Houdt per subsysteem bij of het klaar is, en hoe lang het opstarten ervan duurde."""
+
+    def __init__(self):
+        self.begin = time.perf_counter()
+        self.gereed = {}  # naam -> asyncio.Event
+        self.tijden = {}  # naam -> {"klaar_na": s sinds de start, "duur": s, "mislukt": bool}
+
+    def _event(self, naam):
+        return self.gereed.setdefault(naam, asyncio.Event())
+
+    def klaar(self, *namen):
+        return all(self._event(naam).is_set() for naam in namen)
+
+    async def wacht(self, naam):
+        await self._event(naam).wait()
+
+    async def stap(self, naam, aw):
+        """Wacht op één opstartstap; None of een fout betekent dat het subsysteem niet beschikbaar is."""
+        begin = time.perf_counter()
+        try:
+            resultaat = await aw
+        except Exception as e:
+            print(f"❌ Opstarten van {naam} mislukt: {e}")
+            resultaat = None
+        nu = time.perf_counter()
+        self.tijden[naam] = {"klaar_na": round(nu - self.begin, 3), "duur": round(nu - begin, 3),
+                             "mislukt": resultaat is None}
+        if resultaat is None:
+            return None
+        metrics.meet(f"opstart_{naam}", nu - begin)
+        self._event(naam).set()
+        print(f"🚀 {naam} klaar na {nu - self.begin:.2f} s")
+        return resultaat
+
+def start_audio():
+    """Start de continue opname en laadt het ruisprofiel, of meet de ruimte als er nog geen is."""
+    get_audio_ring()
+    if laad_ruisprofiel() is None:
+        kalibreer_ruis()
+    return True
+
+def start_planning():
+    """Opent de database, archiveert wat te lang geleden gemist is en plant de rest in."""
+    open_opslag()
+    verplaats_verlopen_herinneringen(INHAAL_VENSTER)
+    opruimen = opslag.onderhoud()
+    if opruimen:
+        print(f"🗄 {opruimen} oude archiefrijen opgeruimd.")
+    planner.laad()
+    leer_beschrijvingen()
+    return True
+
+async def start_ble():
+    """Start de verbindingen; klaar zodra de eerste klok verbonden is."""
+    ble_beheer.start()
+    wachters = [asyncio.create_task(apparaat.verbonden.wait()) for apparaat in ble_beheer.apparaten]
+    try:
+        await asyncio.wait(wachters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for wachter in wachters:
+            wachter.cancel()
+    return True
+
+async def start_llm():
+    global deepseek_sessie
+    deepseek_sessie = await asyncio.get_running_loop().run_in_executor(None, run_deepseek)
+    if deepseek_sessie is None or not deepseek_sessie.zorg_gestart():
+        print("⚠️ Deepseek nog niet beschikbaar: tot een volgende poging lukt werken alleen de lokale regels.")
+        return None
+    return deepseek_sessie
+
+async def achtergrond_opstart():
+    """Laadt audio, Vosk, LLM en BLE tegelijk; de klok en de knop werken intussen al."""
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        opstart.stap("opslag", loop.run_in_executor(None, start_planning)),
+        opstart.stap("audio", loop.run_in_executor(audio_executor, start_audio)),
+        opstart.stap("vosk", start_pijplijn() if AUDIO_PROCESSEN > 0 else loop.run_in_executor(None, get_herkenner)),
+        opstart.stap("llm", start_llm()),
+    )
+    print(f"🚀 Opstarttijden: {opstart.tijden}")
 
-    # Sluit de BLE-verbinding bij het afsluiten van het programma
-    if ble_client and ble_client.is_connected:
-        await ble_client.disconnect()
-        print("BLE-verbinding gesloten")
+async def main():
+    global stop_flag, ble_beheer, opstart
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # Eerst alleen wat nodig is voor de klok en de knop
+    opstart = Opstart()
+    metrics.start_endpoint()
+    init_gpio()
+    await opstart.stap("lcd", lcd_async(init_lcd))
+    start_knop_interrupts(loop)
+    ble_beheer = BLEBeheer()
+    planner.koppel(loop)
+
+    taken = [
+        asyncio.create_task(klok_lus()),
+        asyncio.create_task(herken_knop_patronen()),
+        asyncio.create_task(knop_lus()),
+        asyncio.create_task(planner_lus()),
+        asyncio.create_task(archief_lus()),
+        asyncio.create_task(achtergrond_opstart()),
+        asyncio.create_task(opstart.stap("ble", start_ble())),
+    ]
+    await stop_event.wait()
+    stop_flag = True
+
+    # Netjes afsluiten: eerst alle taken annuleren, dan de hardware vrijgeven
+    lopend = [t for t in taken + [alarm_taak, weergave_taak, spraak_taak, *achtergrond_taken] if t is not None]
+    for taak in lopend:
+        taak.cancel()
+    await asyncio.gather(*lopend, return_exceptions=True)
+    stop_buzzer_en_lampje()
 
+    # Sluit de BLE-verbindingen bij het afsluiten van het programma
+    print(f"BLE-latenties: {ble_beheer.statistieken()}")
+    print(f"♻️ Extractiecache: {extractie_cache.statistieken()}")
+    await ble_beheer.stop()
+
+    if deepseek_sessie is not None:
+        deepseek_sessie.stop()
+    if pijplijn is not None:
+        pijplijn.stop()
+    if audio_ring is not None:
+        audio_ring.stop()
+    audio_executor.shutdown(wait=True)
+    if opslag is not None:
+        opslag.sluit()
     lcd_clear()
+    lcd_executor.shutdown(wait=True)
     GPIO.cleanup()
+    metrics.sluit()
     print("Programma gestopt.")
 
-def toon_herinnering(beschrijving, start_tijd):
-    global herinnering_actief
-    while herinnering_actief and (time.time() - start_tijd < HERINNERING_DUUR):
-        if len(beschrijving) > LCD_WIDTH:
-            lcd_scroll_text(1, beschrijving)
-        else:
-            lcd_display(["Herinnering:", beschrijving])
-        time.sleep(1)  # Kortere sleep voor betere responsiviteit
-
-    # Stop de herinnering na 2 minuten
-    herinnering_actief = False
-    stop_buzzer_en_lampje()
-    asyncio.run(control_led("off"))
-    lcd_clear()
-    lcd_display(["Herinnering", "gestopt"])
-    time.sleep(0.5)
-
 # Verplaatsen verlopen herinneringen
-def verplaats_verlopen_herinneringen():
-    conn_actief = sqlite3.connect('herinneringen.db')
-    c_actief = conn_actief.cursor()
-
-    conn_verlopen = sqlite3.connect('verlopen_herinneringen.db')
-    c_verlopen = conn_verlopen.cursor()
-
-    c_verlopen.execute('''CREATE TABLE IF NOT EXISTS verlopen_herinneringen (
-        beschrijving TEXT, datum TEXT, tijd TEXT)''')
-    conn_verlopen.commit()
-
-    huidige_datum = datetime.now().strftime("%Y-%m-%d")
-    huidige_tijd = datetime.now().strftime("%H:%M")
-
-    c_actief.execute("SELECT * FROM herinneringen WHERE datum < ? OR (datum = ? AND tijd < ?)",
-                     (huidige_datum, huidige_datum, huidige_tijd))
-    verlopen_herinneringen = c_actief.fetchall()
-
-    for herinnering in verlopen_herinneringen:
-        c_verlopen.execute("INSERT INTO verlopen_herinneringen (beschrijving, datum, tijd) VALUES (?, ?, ?)",
-                           (herinnering[0], herinnering[1], herinnering[2]))
-        c_actief.execute("DELETE FROM herinneringen WHERE beschrijving = ? AND datum = ? AND tijd = ?",
-                         (herinnering[0], herinnering[1], herinnering[2]))
-
-    conn_verlopen.commit()
-    conn_actief.commit()
-    conn_actief.close()
-    conn_verlopen.close()
+def verplaats_verlopen_herinneringen(ouder_dan=0):
+    """Archiveert herinneringen waarvan het tijdstip meer dan `ouder_dan` seconden voorbij is."""
+    grens = datetime.now() - timedelta(seconds=ouder_dan)
+    aantal = opslag.archiveer_tot(grens.strftime("%Y-%m-%d"), grens.strftime("%H:%M"))
+    if aantal:
+        print(f"🗄 {aantal} verlopen herinneringen gearchiveerd.")
+        if ouder_dan:
+            # Te lang geleden om nog in te halen: deze herinneringen zijn nooit getoond
+            metrics.tel("herinneringen_gemist", aantal)
 
 if __name__ == '__main__':
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         stop_flag = True
-        lcd_clear()
+        if bus is not None:
+            lcd_clear()
         GPIO.cleanup()
         print("Programma gestopt.")
\ No newline at end of file